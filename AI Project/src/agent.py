@@ -1,20 +1,46 @@
 from gameobjects import GameObject
 from move import Move, Direction
+from encoders import RelativeStateEncoder, action_to_move, look, NR_ACTIONS
+from replay import batch_update
 import numpy as np
 import random
 import time
 
 class Agent:
 
-    def __init__(self):
-        """" Constructor of the Agent, can be used to set up variables """
-        self.q_table = np.zeros([5,5,4,5,5,3])
+    def __init__(self, state_encoder=None, q_table=None, replay=None, rng=None):
+        """" Constructor of the Agent, can be used to set up variables
+
+        :param state_encoder: The StateEncoder (see encoders.py) that turns the situation into a row of the Q-table. By
+        default the RelativeStateEncoder is used, which works for every board size.
+
+        :param q_table: A Q-table to start from, for instance one trained earlier and loaded with np.load. It must
+        belong to the same state encoder. By default an empty table is created.
+
+        :param replay: A ReplayBuffer (see replay.py) to learn from minibatches of earlier moves, None to learn from
+        every move once, right after it is made.
+
+        :param rng: The random.Random used for exploring, by default the random module itself.
+        """
+        self.state_encoder = state_encoder if state_encoder is not None else RelativeStateEncoder()
+        self.q_table = q_table if q_table is not None else self.state_encoder.create_q_table()
+        # state, action and reward of the previous move, it is learned from once the next state is known
+        self.previous = None
+        self.replay = replay
+        self.rng = rng if rng is not None else random
         self.alpha = 0.6
         self.gamma = 0.2
         self.t = time.process_time()
         self.epsilon = 0.2
+        # every move epsilon shrinks by total_moves * epsilon_decay, until it reaches min_epsilon
+        self.epsilon_decay = 0.0000000001
+        self.min_epsilon = 0.1
         self.depsilon = 0
         self.total_moves, self.total_penalties, self.food = 0, 0, 0
+        # metrics.Metrics to report to, None to not report
+        self.metrics = None
+        # whether every move should be printed to the console (slow)
+        self.verbose = False
 
 
     def get_move(self, board, score, turns_alive, turns_to_starve, direction, head_position, body_parts):
@@ -25,12 +51,17 @@ class Agent:
 
         :param board: A two dimensional array representing the current state of the board. The upper left most
         coordinate is equal to (0,0) and each coordinate (x,y) can be accessed by executing board[x][y]. At each
-        coordinate a GameObject is present. This can be either GameObject.EMPTY (meaning there is nothing at the
-        given coordinate), GameObject.FOOD (meaning there is food at the given coordinate), GameObject.WALL (meaning
-        there is a wall at the given coordinate. TIP: do not run into them), GameObject.SNAKE_HEAD (meaning the head
-        of the snake is located there) and GameObject.SNAKE_BODY (meaning there is a body part of the snake there.
-        TIP: also, do not run into these). The snake will also die when it tries to escape the board (moving out of
-        the boundaries of the array)
+        coordinate the value of a GameObject is present (the board is a NumPy array of GameObject values, which
+        compare equal to the GameObject itself, so board[x][y] == GameObject.FOOD works). This can be either
+        GameObject.EMPTY (meaning there is nothing at the given coordinate), GameObject.FOOD (meaning there is food at
+        the given coordinate), GameObject.WALL (meaning there is a wall at the given coordinate. TIP: do not run into
+        them), GameObject.SNAKE_HEAD (meaning the head of the snake is located there) and GameObject.SNAKE_BODY
+        (meaning there is a body part of the snake there. TIP: also, do not run into these). The snake will also die
+        when it tries to escape the board (moving out of the boundaries of the array). The board also has the
+        attributes food_positions and wall_positions, which are sets of the (x, y) positions of all food blocks and
+        walls, and board.distance_field gives the distance and the first step from any cell to the nearest food (see
+        distance.py). When get_view_radius does not return -1, this is a View of only the cells around the head
+        instead, see get_view_radius.
 
         :param score: The current score as an integer. Whenever the snake eats, the score will be increased by one.
         When the snake tragically dies (i.e. by running its head into a wall) the score will be reset. In ohter
@@ -51,6 +82,7 @@ class Agent:
 
         :param body_parts: the array of the locations of the body parts of the snake. The last element of this array
         represents the tail and the first element represents the body part directly following the head of the snake.
+        It is a read-only view that follows the snake as it moves, use list(body_parts) to keep a copy of it.
 
         :return: The move of the snake. This can be either Move.LEFT (meaning going left), Move.STRAIGHT (meaning
         going straight ahead) and Move.RIGHT (meaning going right). The moves are made from the viewpoint of the
@@ -58,93 +90,104 @@ class Agent:
         Move.LEFT and Move.RIGHT changes the direction of the snake. In example, if the snake is facing north and the
         move left is made, the snake will go one block to the left and change its direction to west.
         """
-        state_pos = head_position
-        state_posx = head_position[0]
-        state_posy = head_position[1]
-        state_dir = direction.value
-        foodlocx, foodlocy = self.get_food_location(board)
-
-        state = (state_posx, state_posy,state_dir, foodlocx, foodlocy)
-
-
-        done = False
-
-        while not done:
-
-            reward = 0
-            if(random.uniform(0,1) < self.epsilon):
-                action = random.choice([-1,0,1])
-            else:
-                action = np.argmax(self.q_table[state])
-
-
-
-            next_state_posx  = Direction.get_new_direction(direction,Move(action)).get_xy_manipulation()[0] + state_pos[0]
-            next_state_posy = Direction.get_new_direction(direction,Move(action)).get_xy_manipulation()[1] + state_pos[1]
-            next_state_dir = Direction.get_new_direction(direction, Move(action)).value
-
-            if(0 <= next_state_posx < 5 and 0 <= next_state_posy < 5):
-                done = True
+        state = self.state_encoder.encode(board, direction, head_position)
 
+        # now the state after the previous move is known, learn from that move
+        if self.previous is not None:
+            self.learn(*self.previous, state)
 
+        # never pick a move that leaves the board
+        targets = [look(board, direction, head_position, action_to_move(action)) for action in range(NR_ACTIONS)]
+        actions = [action for action in range(NR_ACTIONS) if targets[action] is not None]
 
+        if(self.rng.uniform(0,1) < self.epsilon):
+            action = self.rng.choice(actions)
+        else:
+            action = max(actions, key=lambda a: self.q_table[state][a])
 
-        next_state = (next_state_posx,next_state_posy,next_state_dir,foodlocx,foodlocy)
-        reward = self.reward(board,(next_state_posx,next_state_posy))
+        reward = self.reward(targets[action])
 
         if reward == 10000:
             self.food += 1
+            if self.metrics is not None:
+                self.metrics.add("food", 1)
 
-
-        old_value = self.q_table[state, int(action)]
-        next_max = np.max(self.q_table[next_state])
-
-        new_value = (1 - self.alpha) * old_value + self.alpha * (reward + self.gamma * next_max)
-        self.q_table[state, action] = new_value
+        self.previous = (state, action, reward)
 
 
         self.total_moves += 1
-        self.depsilon = self.total_moves * 0.0000000001
-        if(self.depsilon < self.epsilon and self.epsilon > 0.1):
+        self.depsilon = self.total_moves * self.epsilon_decay
+        if(self.depsilon < self.epsilon and self.epsilon > self.min_epsilon):
             self.epsilon = self.epsilon - self.depsilon
         else:
-            self.epsilon = 0.1
+            self.epsilon = self.min_epsilon
+
+        if self.metrics is not None:
+            self.metrics.add("reward", reward)
+            self.metrics.set("epsilon", self.epsilon)
+        if self.verbose:
+            print("epsilon: " + str(self.epsilon))
+            try:
+                print("score: " + str(self.food / self.total_penalties) + "\n food: " + str(self.food) +
+                      "\n penalties: " + str(self.total_penalties))
+            except:
+                print("niks")
+        return action_to_move(action)
+
+    def learn(self, state, action, reward, next_state):
+        """
+        Q-learning update of the value of the action in the state. next_state is None when the snake died. With a
+        replay buffer the move is stored and a minibatch of stored moves is learned from instead.
+        """
+        if self.replay is not None:
+            if self.replay.add(state, action, reward, next_state):
+                q_delta = batch_update(self.q_table, *self.replay.sample(), self.alpha, self.gamma)
+                if self.metrics is not None:
+                    self.metrics.add("q_delta", q_delta)
+            return
 
-        print("epsilon: " + str(self.epsilon))
-        try:
-            print("score: " + str(self.food / self.total_penalties) + "\n food: " + str(self.food) + "\n penalties: " + str(self.total_penalties))
-        except:
-            print("niks")
-        return Move(action)
+        old_value = self.q_table[state][action]
+        next_max = np.max(self.q_table[next_state]) if next_state is not None else 0
 
-    def get_food_location(self, board):
-        for x in range(len(board)):
-            for y in range(len(board[x])):
-                if (board[x][y] == GameObject.FOOD):
-                    return (x,y)
-
-    def reward(self, board, target):
+        new_value = (1 - self.alpha) * old_value + self.alpha * (reward + self.gamma * next_max)
+        self.q_table[state][action] = new_value
+        if self.metrics is not None:
+            self.metrics.add("q_delta", abs(new_value - old_value))
 
+    def get_food_location(self, board):
+        # the board copy knows where the food is, the first one in the order of the board is returned
+        return min(board.food_positions, default=None)
 
-        try:
-            nextn = board[target[0]][target[1]]
+    def reward(self, target):
+        """
+        :param target: The GameObject the snake moves into, None when it leaves the board.
+        """
+        nextn = target
+        if self.verbose:
             print(nextn)
-            if(nextn == GameObject.WALL):
-                self.total_penalties += 1
-                return -100
-            elif(nextn == GameObject.SNAKE_BODY):
-                return -100
-            elif(nextn == GameObject.EMPTY):
-                return -1
-            elif(nextn == GameObject.FOOD):
-                return 10000
-            elif(nextn == GameObject.SNAKE_HEAD):
-                self.total_penalties += 1
-                return -100
-        except:
-            print("ik kom hier")
-            self.total_penalties += 1
+        if(nextn is None):
+            if self.verbose:
+                print("ik kom hier")
+            self.add_penalty()
+            return -100
+        elif(nextn == GameObject.WALL):
+            self.add_penalty()
             return -100
+        elif(nextn == GameObject.SNAKE_BODY):
+            return -100
+        elif(nextn == GameObject.EMPTY):
+            return -1
+        elif(nextn == GameObject.FOOD):
+            return 10000
+        elif(nextn == GameObject.SNAKE_HEAD):
+            self.add_penalty()
+            return -100
+
+    def add_penalty(self):
+        self.total_penalties += 1
+        if self.metrics is not None:
+            self.metrics.add("penalties", 1)
+
     def should_redraw_board(self):
         """
         This function indicates whether the board should be redrawn. Not drawing to the board increases the number of
@@ -155,6 +198,22 @@ class Agent:
         """
         return True
 
+    def get_view_radius(self):
+        """
+        This function indicates how much of the board the agent gets to see in get_move. Looking only at the cells
+        around the head is a lot faster on large boards. The function is called before the get_move function.
+
+        When a radius k is returned, the board parameter of get_move is a View with two fields. View.cells is a
+        read-only (2k+1) x (2k+1) NumPy array with the GameObject values (i.e. GameObject.WALL.value) of the cells
+        around the head, turned such that the snake always faces north: cells[k][k] is the head, cells[k][k-1] is the
+        cell straight ahead, cells[k-1][k] the cell to the left and cells[k+1][k] the cell to the right. Cells outside
+        of the board are shown as walls. View.food is a list with the (x, y) position of each food block relative to
+        the head, turned the same way.
+
+        :return: The radius k as an integer, or -1 to get a copy of the whole board (as described in get_move).
+        """
+        return -1
+
     def should_grow_on_food_collision(self):
         """
         This function indicates whether the snake should grow when colliding with a food object. This function is
@@ -181,3 +240,7 @@ class Agent:
         represents the tail and the first element represents the body part directly following the head of the snake.
         When the snake runs in its own body the following holds: head_position in body_parts.
         """
+        # the snake died, so there is no next state to learn from
+        if self.previous is not None:
+            self.learn(*self.previous, None)
+            self.previous = None
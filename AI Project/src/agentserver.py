@@ -0,0 +1,441 @@
+"""
+Agent server. The agent runs in its own process and the games ask it for their moves over a local socket, so one
+(expensive) agent can play many games at once. The server collects the requests of all connected games and decides
+them together with one call of its policy, which only pays the per-call overhead (i.e. of a NumPy operation or a
+neural network) once per batch.
+
+Start a server and let 32 games, played with asyncio in another process, connect to it:
+
+    python agentserver.py serve --socket /tmp/snake.sock --policy q-table --q-table q_table.npy
+    python agentserver.py play --socket /tmp/snake.sock --games 32 --tics 100000
+
+Or use the server from a normal game (i.e. in main.py) with snake.agent = RemoteAgent("/tmp/snake.sock", 5, 5).
+Where Unix sockets are not available, use --port instead of --socket.
+
+Protocol: every message is a frame of a 4 byte little-endian length followed by the payload. A game first sends a
+HELLO with the size of its board. After that it sends a MOVE with the state of the game every turn, which the server
+answers with a single byte (move.value + 1, or 3 for no move), and a DIED with the state at the moment of dying
+(without the snake on the board, like Agent.on_die), which is not answered. A state consists of a fixed header
+(STATE_HEADER) followed by one byte (the GameObject value) per cell, x * board_height + y, and the body parts as cell
+numbers (uint32).
+"""
+import argparse
+import asyncio
+import os
+import socket
+import struct
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from agent import Agent
+from board import BoardCopy
+from encoders import RelativeStateEncoder, action_to_move
+from gameobjects import GameObject
+from headless import add_game_arguments, create_game
+from move import DX_TABLE, DY_TABLE, Direction, Move, NEW_DIRECTION_TABLE
+
+HELLO, MOVE, DIED = 0, 1, 2
+NO_MOVE = 3
+FRAME_HEADER = struct.Struct("<I")
+HELLO_MESSAGE = struct.Struct("<BHH")
+# kind, direction, head x, head y, score, turns alive, turns to starve, number of body parts
+STATE_HEADER = struct.Struct("<BBiiiiiI")
+
+FOOD = GameObject.FOOD.value
+WALL = GameObject.WALL.value
+
+RemoteState = namedtuple('RemoteState', ['board', 'score', 'turns_alive', 'turns_to_starve', 'direction',
+                                         'head_position', 'body_parts'])
+
+
+def frame(payload):
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def get_cell_bytes(board):
+    """
+    :param board: A copy of the board as given to Agent.get_move (not a View).
+
+    :return: The GameObject values of the cells as bytes, x * board_height + y.
+    """
+    return np.asarray(board, dtype=np.uint8).tobytes()
+
+
+def encode_state(kind, cells, board_height, score, turns_alive, turns_to_starve, direction, head_position,
+                 body_parts):
+    """
+    :param cells: The cells as bytes, see get_cell_bytes and Board.get_cells.
+    """
+    body = np.array([x * board_height + y for x, y in body_parts], dtype="<u4").tobytes()
+    return STATE_HEADER.pack(kind, direction.value, head_position[0], head_position[1], score, turns_alive,
+                             turns_to_starve, len(body_parts)) + cells + body
+
+
+def decode_state(payload, board_width, board_height):
+    """
+    :return: A RemoteState with the same values as the encoded state. The board is a BoardCopy.
+    """
+    kind, direction, x, y, score, turns_alive, turns_to_starve, nr_body_parts = STATE_HEADER.unpack_from(payload)
+    offset = STATE_HEADER.size
+    nr_cells = board_width * board_height
+    cells = payload[offset:offset + nr_cells]
+    values = np.frombuffer(cells, dtype=np.uint8)
+    food_positions = frozenset(divmod(cell, board_height) for cell in np.flatnonzero(values == FOOD).tolist())
+    wall_positions = frozenset(divmod(cell, board_height) for cell in np.flatnonzero(values == WALL).tolist())
+    body = np.frombuffer(payload, dtype="<u4", count=nr_body_parts, offset=offset + nr_cells).tolist()
+    board = BoardCopy(values.reshape(board_width, board_height), food_positions, wall_positions)
+    return RemoteState(board, score, turns_alive, turns_to_starve, Direction(direction), (x, y),
+                     [divmod(cell, board_height) for cell in body])
+
+
+def to_code(move):
+    if move == Move.LEFT or move == Move.STRAIGHT or move == Move.RIGHT:
+        return move.value + 1
+    return NO_MOVE
+
+
+def to_move(code):
+    return Move(code - 1) if code != NO_MOVE else None
+
+
+class AgentPolicy:
+    """
+    Serves every game with its own normal agent (see agent.py). This works for every agent, but does not combine
+    the work of the games.
+    """
+
+    def __init__(self, agent_factory=Agent):
+        self.agent_factory = agent_factory
+        self.agents = {}
+
+    def get_agent(self, game):
+        if game not in self.agents:
+            self.agents[game] = self.agent_factory()
+        return self.agents[game]
+
+    def get_moves(self, games, states):
+        return [self.get_agent(game).get_move(*state) for game, state in zip(games, states)]
+
+    def on_die(self, game, state):
+        self.get_agent(game).on_die(state.head_position, state.board, state.score, state.body_parts)
+
+    def remove(self, game):
+        self.agents.pop(game, None)
+
+
+class QTablePolicy:
+    """
+    Plays the best move according to a Q-table (without exploring or learning). The rows of all states in a batch
+    are looked up and compared at once.
+    """
+
+    def __init__(self, q_table, state_encoder=None):
+        self.state_encoder = state_encoder if state_encoder is not None else RelativeStateEncoder()
+        self.q_table = q_table
+
+    def get_moves(self, games, states):
+        rows = [self.state_encoder.encode(state.board, state.direction, state.head_position) for state in states]
+        if isinstance(self.q_table, np.ndarray):
+            values = self.q_table[np.array(rows)].astype(np.float64)
+        else:
+            values = np.array([self.q_table[row] for row in rows], dtype=np.float64)
+
+        # never pick a move that leaves the board, like Agent.get_move
+        directions = NEW_DIRECTION_TABLE[np.array([state.direction.value for state in states])]
+        x = np.array([state.head_position[0] for state in states])[:, None] + DX_TABLE[directions]
+        y = np.array([state.head_position[1] for state in states])[:, None] + DY_TABLE[directions]
+        widths = np.array([len(state.board) for state in states])[:, None]
+        heights = np.array([len(state.board[0]) for state in states])[:, None]
+        values[(x < 0) | (x >= widths) | (y < 0) | (y >= heights)] = -np.inf
+        return [action_to_move(action) for action in values.argmax(axis=1)]
+
+    def on_die(self, game, state):
+        pass
+
+    def remove(self, game):
+        pass
+
+
+class AgentServer:
+
+    def __init__(self, policy, max_batch=256, max_delay=0.002):
+        """
+        :param policy: Decides the moves, see AgentPolicy and QTablePolicy. get_moves(games, states) gets the
+        numbers of the games and their RemoteStates and returns a Move per game, on_die(game, state) is told about
+        every death and remove(game) about every game that disconnects.
+
+        :param max_batch: The maximum number of requests decided together.
+
+        :param max_delay: The maximum number of seconds a request waits for the requests of other games. A batch is
+        decided right away when every connected game is waiting.
+        """
+        self.policy = policy
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.pending = []
+        self.timer = None
+        self.nr_games = 0
+        self.next_game = 0
+        self.nr_batches = 0
+        self.nr_requests = 0
+
+    async def serve(self, address):
+        """
+        Serves until cancelled.
+
+        :param address: The path of a Unix socket, or a (host, port) tuple for TCP.
+        """
+        if isinstance(address, str):
+            # a socket file left behind by a server that was stopped would make starting fail
+            if os.path.exists(address):
+                os.remove(address)
+            server = await asyncio.start_unix_server(self.handle, address)
+        else:
+            server = await asyncio.start_server(self.handle, *address)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        game = self.next_game
+        self.next_game += 1
+        self.nr_games += 1
+        try:
+            kind, board_width, board_height = HELLO_MESSAGE.unpack(await read_frame(reader))
+            while True:
+                payload = await read_frame(reader)
+                state = decode_state(payload, board_width, board_height)
+                if payload[0] == MOVE:
+                    future = asyncio.get_running_loop().create_future()
+                    self.pending.append((game, state, future))
+                    self.schedule()
+                    writer.write(bytes([to_code(await future)]))
+                    await writer.drain()
+                elif payload[0] == DIED:
+                    self.policy.on_die(game, state)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.nr_games -= 1
+            self.policy.remove(game)
+            writer.close()
+            # the game that left may have been the last one that was not waiting yet
+            self.schedule()
+
+    def schedule(self):
+        if len(self.pending) == 0:
+            return
+        if len(self.pending) >= min(self.max_batch, self.nr_games):
+            self.decide()
+        elif self.timer is None:
+            self.timer = asyncio.get_running_loop().call_later(self.max_delay, self.decide)
+
+    def decide(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+        # the future of a game that is gone (i.e. its client disconnected) has been cancelled, its move is not needed
+        batch = [(game, state, future) for game, state, future in batch if not future.done()]
+        if len(batch) == 0:
+            self.schedule()
+            return
+        self.nr_batches += 1
+        self.nr_requests += len(batch)
+        error = None
+        try:
+            moves = self.policy.get_moves([game for game, state, future in batch],
+                                          [state for game, state, future in batch])
+        except Exception as exception:
+            moves, error = [None] * len(batch), exception
+        for (game, state, future), move in zip(batch, moves):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(move)
+        self.schedule()
+
+
+async def read_frame(reader):
+    length, = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    return await reader.readexactly(length)
+
+
+def connect(address):
+    if isinstance(address, str):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    else:
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    connection.connect(address)
+    return connection
+
+
+class RemoteAgent:
+    """
+    Agent that asks an agent server for every move, so it can be used like a normal agent: snake.agent =
+    RemoteAgent(address, board_width, board_height).
+    """
+
+    def __init__(self, address, board_width, board_height, grow=False):
+        """
+        :param grow: The answer to should_grow_on_food_collision.
+        """
+        self.connection = connect(address)
+        self.file = self.connection.makefile("rb")
+        self.grow = grow
+        self.connection.sendall(frame(HELLO_MESSAGE.pack(HELLO, board_width, board_height)))
+
+    def get_move(self, board, score, turns_alive, turns_to_starve, direction, head_position, body_parts):
+        self.connection.sendall(frame(encode_state(MOVE, get_cell_bytes(board), len(board[0]), score, turns_alive,
+                                                   turns_to_starve, direction, head_position, body_parts)))
+        return to_move(self.file.read(1)[0])
+
+    def should_redraw_board(self):
+        return True
+
+    def get_view_radius(self):
+        return -1
+
+    def should_grow_on_food_collision(self):
+        return self.grow
+
+    def on_die(self, head_position, board, score, body_parts):
+        self.connection.sendall(frame(encode_state(DIED, get_cell_bytes(board), len(board[0]), score, 0, 0,
+                                                   Direction.NORTH, head_position, body_parts)))
+
+    def close(self):
+        self.file.close()
+        self.connection.close()
+
+
+class AsyncRemoteAgent:
+    """
+    Agent for a game played with asyncio: the game asks the server for the move with await get_remote_move before
+    every Snake.update, which then makes that move.
+    """
+
+    def __init__(self, reader, writer, grow=False):
+        self.reader = reader
+        self.writer = writer
+        self.grow = grow
+        self.move = None
+
+    async def get_remote_move(self, snake, board):
+        self.writer.write(frame(encode_state(MOVE, board.get_cells().tobytes(), board.height, snake.score,
+                                             snake.tics_alive, snake.tics_to_starve, snake.direction,
+                                             (snake.x, snake.y), snake.body_parts)))
+        self.move = to_move((await self.reader.readexactly(1))[0])
+
+    def get_move(self, board, score, turns_alive, turns_to_starve, direction, head_position, body_parts):
+        return self.move
+
+    def should_redraw_board(self):
+        return False
+
+    def get_view_radius(self):
+        # the board is sent by get_remote_move, a small view is the cheapest thing to hand to get_move
+        return 0
+
+    def should_grow_on_food_collision(self):
+        return self.grow
+
+    def on_die(self, head_position, board, score, body_parts):
+        self.writer.write(frame(encode_state(DIED, get_cell_bytes(board), len(board[0]), score, 0, 0,
+                                             Direction.NORTH, head_position, body_parts)))
+
+
+async def play_game(address, game_settings, max_tics, seed=None):
+    """
+    Plays one game against the agent server.
+
+    :return: A tuple (episodes, total score).
+    """
+    if isinstance(address, str):
+        reader, writer = await asyncio.open_unix_connection(address)
+    else:
+        reader, writer = await asyncio.open_connection(*address)
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    snake, board = create_game(*game_settings, seed=seed)
+    agent = snake.agent = AsyncRemoteAgent(reader, writer)
+    writer.write(frame(HELLO_MESSAGE.pack(HELLO, board.width, board.height)))
+    episodes, total_score = 0, 0
+    for tic in range(max_tics):
+        # a starving snake dies without asking for a move
+        if snake.tics_to_starve != 0:
+            await agent.get_remote_move(snake, board)
+        died, _ = snake.update(board)
+        if died:
+            episodes += 1
+            total_score += snake.score
+            snake.reset(board, False, True)
+    writer.close()
+    await writer.wait_closed()
+    return episodes, total_score
+
+
+async def play_games(address, nr_games, game_settings, max_tics, seed=None):
+    """
+    Plays nr_games games at once against the agent server.
+
+    :return: A list with a tuple (episodes, total score) per game.
+    """
+    return await asyncio.gather(*[play_game(address, game_settings, max_tics,
+                                            None if seed is None else seed + game) for game in range(nr_games)])
+
+
+def get_address(args):
+    return args.socket if args.port is None else ("127.0.0.1", args.port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve an agent to many games, or play games against a server.")
+    parser.add_argument("command", choices=["serve", "play"])
+    parser.add_argument("--socket", default="snake-agent.sock", help="path of the Unix socket")
+    parser.add_argument("--port", type=int, default=None, help="use a TCP port on localhost instead of a Unix socket")
+    parser.add_argument("--policy", choices=["agent", "q-table"], default="agent",
+                        help="serve: a normal agent per game, or the best moves of a Q-table for all games")
+    parser.add_argument("--q-table", default=None, help="serve: .npy file with the Q-table, empty by default")
+    parser.add_argument("--max-batch", type=int, default=256, help="serve: maximum number of requests per batch")
+    parser.add_argument("--max-delay", type=float, default=0.002,
+                        help="serve: maximum number of seconds a request waits for others")
+    parser.add_argument("--games", type=int, default=32, help="play: number of games played at once")
+    parser.add_argument("--tics", type=int, default=10000, help="play: number of turns per game")
+    add_game_arguments(parser)
+    parser.add_argument("--seed", type=int, default=None, help="play: seed of the first game, the others count up")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        if args.policy == "agent":
+            policy = AgentPolicy()
+        else:
+            state_encoder = RelativeStateEncoder()
+            q_table = np.load(args.q_table) if args.q_table is not None else state_encoder.create_q_table()
+            policy = QTablePolicy(q_table, state_encoder)
+        server = AgentServer(policy, args.max_batch, args.max_delay)
+        start = time.perf_counter()
+        try:
+            asyncio.run(server.serve(get_address(args)))
+        except KeyboardInterrupt:
+            pass
+        seconds = time.perf_counter() - start
+        print("Requests: {}. Batches: {}. Mean batch size: {:.1f}. Requests/s: {:.0f}".format(
+            server.nr_requests, server.nr_batches, server.nr_requests / max(server.nr_batches, 1),
+            server.nr_requests / seconds if seconds > 0 else 0))
+    else:
+        game_settings = (args.width, args.height, args.food, args.walls, args.test_config, args.starvation)
+        start = time.perf_counter()
+        results = asyncio.run(play_games(get_address(args), args.games, game_settings, args.tics, args.seed))
+        seconds = time.perf_counter() - start
+        episodes = sum(game_episodes for game_episodes, score in results)
+        total_score = sum(score for game_episodes, score in results)
+        print("Games: {}. Turns: {}. Episodes: {}. Total score: {}. Time: {:.2f}s ({:.0f} turns/s)".format(
+            args.games, args.games * args.tics, episodes, total_score, seconds,
+            args.games * args.tics / seconds if seconds > 0 else 0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Arena: many snakes, each with its own agent, playing on one board at the same time. Every turn all snakes first decide
+their move on the same board, after which they all move at once:
+
+- a snake that leaves the board or moves into a wall dies,
+- snakes whose heads move into the same cell all die,
+- a snake that moves into a cell of any snake (its own included) dies, unless that snake leaves the cell in the same
+  turn (i.e. its tail moves on) and survives the turn itself,
+- the snakes that survive eat the food they moved onto.
+
+The collisions are found with the occupancy index of the board (Board.occupants, the number of the snake in every
+cell), so a turn costs the same for every snake, however long the snakes are. A dead snake stays on the board until it
+is reset, like a single snake.
+
+It can be used from Python:
+
+    from arena import Arena, create_arena
+    arena = Arena(create_arena(100, 200, 200, 50, 50, False, -1))
+    died = arena.update()
+
+or from the command line:
+
+    python arena.py --snakes 100 --width 200 --height 200 --food 50 --walls 50 --tics 1000
+"""
+import argparse
+import random
+import time
+
+from board import Board
+from headless import RunResult, add_game_arguments
+from snake import Snake
+
+
+def create_arena(nr_snakes, board_width, board_height, food_blocks_max, wall_blocks_max, test_config,
+                 starvation_tics, seed=None):
+    """
+    Creates a board with the given number of snakes on it, each with its own Agent.
+
+    :param seed: Seed of the random numbers of the game and of the agents, see headless.create_game.
+
+    :return: The board, the snakes are in board.snakes.
+    """
+    rng = random.Random(seed) if seed is not None else None
+    snake = Snake(board_width, board_height, starvation_tics, rng)
+    board = Board(board_width, board_height, board_width, board_height, snake, food_blocks_max, wall_blocks_max,
+                  test_config, rng)
+    for i in range(1, nr_snakes):
+        board.add_snake(Snake(board_width, board_height, starvation_tics, rng))
+    if seed is not None:
+        for snake in board.snakes:
+            snake.agent.rng = random.Random("{}:agent:{}".format(seed, snake.number))
+    return board
+
+
+class Arena:
+
+    def __init__(self, board):
+        self.board = board
+        board.track_occupants()
+
+    def update(self):
+        """
+        Plays one turn for all snakes on the board.
+
+        :return: A list of the snakes that died in this turn. They are not reset yet, so their score can still be
+        read, use reset to let them start over.
+        """
+        board = self.board
+        snakes = board.snakes
+        # all snakes see the board as it was before anyone moved, so one copy is enough for all agents
+        board_copy = None
+        if any(snake.agent.get_view_radius() == -1 for snake in snakes):
+            board_copy = board.get_copy()
+        moves = [snake.decide(board, board_copy) for snake in snakes]
+
+        # where the heads go and which snake leaves which cell
+        targets = [snake.get_next_position(move) if move is not None else None for snake, move in zip(snakes, moves)]
+        nr_heads = {}
+        freed_by = {}
+        for snake, target in zip(snakes, targets):
+            if target is not None:
+                nr_heads[target] = nr_heads.get(target, 0) + 1
+                for cell in snake.get_freed_cells():
+                    freed_by[cell] = snake
+
+        dead = set()
+        # the snakes moving into a cell that the key snake leaves, they only survive when that snake moves
+        followers = {}
+        for snake, target in zip(snakes, targets):
+            if target is None or self.collides(target, nr_heads):
+                dead.add(snake)
+            elif board.occupants[target] != -1:
+                leader = freed_by.get(target)
+                if leader is None:
+                    dead.add(snake)
+                else:
+                    followers.setdefault(leader, []).append(snake)
+        # a dead snake does not move, so whoever follows its tail runs into it
+        queue = list(dead)
+        for snake in queue:
+            for follower in followers.get(snake, ()):
+                if follower not in dead:
+                    dead.add(follower)
+                    queue.append(follower)
+
+        survivors = [(snake, move) for snake, move in zip(snakes, moves) if snake not in dead]
+        for snake, move in survivors:
+            snake.advance(board, move)
+        for snake, move in survivors:
+            snake.finish_turn(board)
+        return [snake for snake in snakes if snake in dead]
+
+    def collides(self, target, nr_heads):
+        """
+        :return: Whether a head moving to the target (x, y) dies by leaving the board, running into a wall or into
+        another head. Running into a snake is checked by update.
+        """
+        board = self.board
+        x, y = target
+        if x < 0 or x >= board.width or y < 0 or y >= board.height:
+            return True
+        if board.is_wall_at(x, y):
+            return True
+        return nr_heads[target] > 1
+
+    def reset(self, snakes, print_scores=False):
+        """
+        Lets the given (dead) snakes start over at random free cells.
+        """
+        for snake in snakes:
+            snake.reset(self.board, False, not print_scores)
+
+
+def run(arena, max_tics=None, max_seconds=None, print_scores=False):
+    """
+    Plays the arena until one of the limits is reached, like headless.run.
+
+    :return: A RunResult, where tics counts the turns of the arena and the episodes and scores are of all snakes
+    together.
+    """
+    tics, episodes, total_score, best_score = 0, 0, 0, 0
+    start = time.perf_counter()
+    deadline = None if max_seconds is None else start + max_seconds
+    while True:
+        if max_tics is not None and tics >= max_tics:
+            break
+        if deadline is not None and time.perf_counter() >= deadline:
+            break
+
+        died = arena.update()
+        tics += 1
+        for snake in died:
+            episodes += 1
+            total_score += snake.score
+            best_score = max(best_score, snake.score)
+        arena.reset(died, print_scores)
+
+    return RunResult(tics, episodes, total_score, best_score, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Let many snakes play on one board without rendering it.")
+    add_game_arguments(parser)
+    parser.add_argument("--snakes", type=int, default=10, help="number of snakes on the board")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random numbers of the game")
+    parser.add_argument("--tics", type=int, default=None, help="stop after this many turns")
+    parser.add_argument("--seconds", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--print-scores", action="store_true", help="print the score of every episode")
+    args = parser.parse_args(argv)
+    if args.tics is None and args.seconds is None:
+        parser.error("give --tics or --seconds")
+
+    arena = Arena(create_arena(args.snakes, args.width, args.height, args.food, args.walls, args.test_config,
+                               args.starvation, args.seed))
+    result = run(arena, args.tics, args.seconds, args.print_scores)
+    print("Snakes: {}. Turns: {}. Episodes: {}. Total score: {}. Best score: {}. Time: {:.2f}s ({:.0f} snake turns/s)"
+          .format(args.snakes, result.tics, result.episodes, result.total_score, result.best_score, result.seconds,
+                  result.tics * args.snakes / result.seconds if result.seconds > 0 else 0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Benchmarks of the game engine. Every benchmark times one operation (Snake.update, Board.get_copy, ...) on a board of
+a given size, with a snake of a given length and a given number of walls, and reports the number of calls per second
+and the latency percentiles of a single call. The results can be written to a JSON file and compared with an earlier
+run to find regressions:
+
+    python benchmark.py --output baseline.json
+    (change the engine)
+    python benchmark.py --compare baseline.json
+
+The compare run exits with status 1 when an operation got slower than the threshold allows.
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from agent import Agent
+from board import Board
+from gamestate import get_state
+from gameobjects import GameObject
+from move import Direction, Move
+from snake import Snake
+
+DEFAULT_SIZES = [5, 25, 100, 500]
+DEFAULT_LENGTHS = [0, 20, 1000]
+DEFAULT_WALLS = [0, 100]
+
+
+class StubCanvas:
+    """
+    Stands in for a Tk canvas, so drawing can be timed without a window.
+    """
+
+    def __init__(self):
+        self.nr_items = 0
+
+    def create_rectangle(self, *args, **kwargs):
+        self.nr_items += 1
+        return self.nr_items
+
+    def create_text(self, *args, **kwargs):
+        self.nr_items += 1
+        return self.nr_items
+
+    def itemconfig(self, item, **kwargs):
+        pass
+
+    def delete(self, *items):
+        pass
+
+
+class BenchmarkAgent(Agent):
+    """
+    Agent that goes straight whenever it can and otherwise turns away from danger, so the snake stays alive for a
+    long time at (almost) no cost of its own.
+    """
+
+    def get_move(self, board, score, turns_alive, turns_to_starve, direction, head_position, body_parts):
+        for move in (Move.STRAIGHT, Move.LEFT, Move.RIGHT):
+            dx, dy = direction.get_new_direction(move).get_xy_manipulation()
+            x, y = head_position[0] + dx, head_position[1] + dy
+            if 0 <= x < len(board) and 0 <= y < len(board[x]) and \
+                    board[x][y] in (GameObject.EMPTY, GameObject.FOOD):
+                return move
+        return Move.STRAIGHT
+
+    def should_redraw_board(self):
+        return False
+
+
+def create_game(size, length, walls, seed=0):
+    """
+    Creates a size x size board with a snake of the given length laid out row by row from the upper left corner, and
+    the given number of walls at random free cells.
+    """
+    random.seed(seed)
+    path = [(x if y % 2 == 0 else size - 1 - x, y) for y in range(size) for x in range(size)]
+    snake = Snake(size, size, -1)
+    snake.agent = BenchmarkAgent()
+    snake.x, snake.y = path[length]
+    snake.body_parts = reversed(path[:length])
+    snake.size = length
+    if length > 0:
+        delta = (path[length][0] - path[length - 1][0], path[length][1] - path[length - 1][1])
+        snake.direction = next(direction for direction in Direction if direction.get_xy_manipulation() == delta)
+    board = Board(size, size, 800, 800, snake, 1, walls, False)
+    return snake, board
+
+
+def time_calls(function, max_calls, max_seconds, setup=None):
+    """
+    Calls the function until max_calls calls have been made or max_seconds have passed (but at least 3 times).
+
+    :param setup: Function called before every call, its time is not measured.
+
+    :return: An array with the duration of every call in seconds.
+    """
+    durations = []
+    deadline = time.perf_counter() + max_seconds
+    while len(durations) < max_calls and (len(durations) < 3 or time.perf_counter() < deadline):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return np.array(durations)
+
+
+def get_benchmarks(snake, board):
+    """
+    :return: A list of (name, function, setup) tuples for a game.
+    """
+    canvas = StubCanvas()
+    board_copy = board.get_copy()
+    agent = Agent()
+
+    def update():
+        if snake.update(board)[0]:
+            snake.reset(board, False, True)
+
+    def draw_full():
+        board.clear_drawing()
+        board.draw(canvas)
+
+    def agent_get_move():
+        agent.get_move(board_copy, 0, 0, -1, snake.direction, (snake.x, snake.y), snake.body_parts)
+
+    state = get_state(snake, board, seed=0)
+
+    def clone_step():
+        future = state.clone()
+        for move in (Move.STRAIGHT, Move.LEFT, Move.RIGHT):
+            if future.step(move):
+                break
+
+    return [
+        ("Snake.update", update, None),
+        ("Board.get_copy", board.get_copy, None),
+        ("Board.get_copy_without_snake", board.get_copy_without_snake, None),
+        ("Board.get_free_xy", board.get_free_xy, None),
+        ("Board.draw (full)", draw_full, None),
+        ("Board.draw (one turn)", lambda: board.draw(canvas), update),
+        ("Agent.get_move", agent_get_move, None),
+        ("GameState.clone", state.clone, None),
+        ("GameState.clone + step", clone_step, None),
+    ]
+
+
+def run_benchmarks(sizes=None, lengths=None, walls=None, max_calls=1000, max_seconds=0.5, only=None, log=None):
+    """
+    Runs all benchmarks for every combination of board size, snake length and number of walls. Combinations where
+    the snake and walls would take more than half of the board are skipped.
+
+    :param only: When given, only the benchmarks whose name contains this text are run.
+
+    :param log: File to write progress to, None for no progress.
+
+    :return: A list with one dictionary of results per benchmark and combination.
+    """
+    results = []
+    for size in sizes or DEFAULT_SIZES:
+        for length in lengths or DEFAULT_LENGTHS:
+            for nr_walls in walls or DEFAULT_WALLS:
+                if length + nr_walls > size * size // 2:
+                    continue
+                snake, board = create_game(size, length, nr_walls)
+                for name, function, setup in get_benchmarks(snake, board):
+                    if only is not None and only not in name:
+                        continue
+                    durations = time_calls(function, max_calls, max_seconds, setup)
+                    result = {
+                        "name": name, "width": size, "height": size, "length": length, "walls": nr_walls,
+                        "calls": len(durations),
+                        "per_second": len(durations) / durations.sum() if durations.sum() > 0 else float("inf"),
+                        "mean_us": durations.mean() * 1e6,
+                        "p50_us": np.percentile(durations, 50) * 1e6,
+                        "p90_us": np.percentile(durations, 90) * 1e6,
+                        "p99_us": np.percentile(durations, 99) * 1e6,
+                    }
+                    results.append(result)
+                    if log is not None:
+                        print(format_result(result), file=log)
+    return results
+
+
+def get_key(result):
+    return result["name"], result["width"], result["height"], result["length"], result["walls"]
+
+
+def format_result(result):
+    return "{:<30} {:>4}x{:<4} length {:>5} walls {:>5}: {:>12.0f}/s  p50 {:>10.1f}us  p90 {:>10.1f}us  " \
+           "p99 {:>10.1f}us".format(result["name"], result["width"], result["height"], result["length"],
+                                    result["walls"], result["per_second"], result["p50_us"], result["p90_us"],
+                                    result["p99_us"])
+
+
+def compare(results, baseline, threshold):
+    """
+    Compares the median latency of every benchmark with the baseline.
+
+    :param threshold: The relative slowdown that is still accepted, i.e. 0.1 allows 10% slower.
+
+    :return: A list of (result, baseline result, slowdown) tuples for the benchmarks that got too slow.
+    """
+    baseline_results = {get_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = baseline_results.get(get_key(result))
+        if old is None or old["p50_us"] <= 0:
+            continue
+        slowdown = result["p50_us"] / old["p50_us"] - 1
+        if slowdown > threshold:
+            regressions.append((result, old, slowdown))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the game engine.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="board sizes (width = height)")
+    parser.add_argument("--lengths", type=int, nargs="+", default=DEFAULT_LENGTHS, help="snake lengths")
+    parser.add_argument("--walls", type=int, nargs="+", default=DEFAULT_WALLS, help="numbers of walls")
+    parser.add_argument("--only", default=None, help="only run the benchmarks whose name contains this text")
+    parser.add_argument("--max-calls", type=int, default=1000, help="maximum number of calls per benchmark")
+    parser.add_argument("--max-seconds", type=float, default=0.5, help="maximum time per benchmark")
+    parser.add_argument("--output", default=None, help="JSON file to write the results to")
+    parser.add_argument("--compare", default=None, help="JSON file of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown of the median latency that counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.lengths, args.walls, args.max_calls, args.max_seconds, args.only,
+                             log=sys.stdout)
+
+    if args.output is not None:
+        report = {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "results": results,
+        }
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        for result, old, slowdown in regressions:
+            print("REGRESSION {:<30} {}x{} length {} walls {}: p50 {:.1f}us -> {:.1f}us (+{:.0%})".format(
+                result["name"], result["width"], result["height"], result["length"], result["walls"],
+                old["p50_us"], result["p50_us"], slowdown))
+        print("{} regression(s) against {}".format(len(regressions), args.compare))
+        if len(regressions) > 0:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,94 @@
-from random import randint
+import random
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+from distance import DistanceField
 from gameobjects import *
 
+View = namedtuple('View', ['cells', 'food'])
+
+# the value of an empty cell as a plain int, a NumPy cell compares with it a lot faster than with the member
+EMPTY = int(GameObject.EMPTY)
+
+
+class BoardCopy(np.ndarray):
+    """
+    Copy of the board as a two dimensional uint8 NumPy array of GameObject values, which also knows where the food and
+    the walls are. GameObject is an IntEnum, so a cell can be compared with it directly: board[x][y] == GameObject.FOOD.
+    """
+
+    def __new__(cls, cells, food_positions, wall_positions, source=None):
+        copy = np.array(cells, dtype=np.uint8).view(cls)
+        copy.food_positions = food_positions
+        copy.wall_positions = wall_positions
+        copy.source = source
+        return copy
+
+    def __array_finalize__(self, obj):
+        # also called for slices (i.e. board[x]), which keep the attributes of the copy they are taken from
+        self.food_positions = getattr(obj, "food_positions", frozenset())
+        self.wall_positions = getattr(obj, "wall_positions", frozenset())
+        self.source = getattr(obj, "source", None)
+
+    @property
+    def distance_field(self):
+        """
+        The DistanceField (see distance.py) of the board this is a copy of, which is only valid until the board
+        changes (so during get_move). None for a copy without the snake.
+        """
+        return self.source.get_distance_field() if self.source is not None else None
+
 
 class Board:
-    max_random_tries = 5
 
     def __init__(self, board_width, board_height, canvas_width, canvas_height, snake, max_nr_food, nr_walls,
-                 test_config):
+                 test_config, rng=None):
+        """
+        :param rng: The random.Random that places the walls and the food, by default the random module itself. Give
+        the board and the snake the same seeded Random to make a game reproducible.
+        """
+        # the snake of the board and all snakes on it, more snakes can be added with add_snake
         self.snake = snake
+        self.snakes = [snake]
+        snake.number = 0
+        self.rng = rng if rng is not None else random
         self.width = board_width
         self.height = board_height
-        self.board = [[GameObject.EMPTY for x in range(board_width)] for y in range(board_height)]
+        # GameObject values of the walls, the food and the empty cells, without the snake
+        self.board = np.full((board_width, board_height), GameObject.EMPTY, dtype=np.uint8)
         self.block_width = canvas_width / board_width
         self.block_height = canvas_height / board_height
         self.max_nr_food = max_nr_food
+        # canvas items of the drawn cells, the game objects they show and the cells that may have changed since
+        self.canvas = None
+        self.cell_items = None
+        self.drawn_objects = None
+        self.dirty_cells = set()
+        # positions of the food blocks and walls on the board
+        self.food_positions = set()
+        self.wall_positions = set()
+        # the number of the snake (see add_snake) in every cell, -1 for the cells without a snake. Only kept once it is
+        # needed (see track_occupants), with a single snake every snake cell belongs to the snake of the board
+        self.occupants = None
+        # GameObject values of all cells (snakes included), padded with walls for the views, and the part without the
+        # padding: get_game_object_at(x, y) is inner_cells[x, y]
+        self.cells = None
+        self.inner_cells = None
+        self.cells_padding = 0
+        self.build_cells(0)
+        # the free cells (no snake, food or wall) in random order as cell numbers x * height + y, and the index of
+        # each cell in that list (-1 when it is not free), so a random free cell can be picked and a cell can be
+        # taken or freed in constant time
+        nr_cells = board_width * board_height
+        free = np.flatnonzero(self.inner_cells.ravel() == GameObject.EMPTY).astype(np.int32)
+        indices = np.full(nr_cells, -1, dtype=np.int32)
+        indices[free] = np.arange(len(free), dtype=np.int32)
+        self.free_cells = array("i", free.tobytes())
+        self.free_cell_indices = array("i", indices.tobytes())
+        # distances to the nearest food, only created once they are requested
+        self.distance_field = None
         self.wall_pos_not_allowed = [(0, 1), (1, 0), (self.width - 2, 0), (self.width - 1, 1), (self.width - 1, self.height - 2),
                            (self.width - 2, self.height - 1), (0, self.height - 2), (1, self.height - 1)]
         if not test_config:
@@ -27,46 +102,214 @@ class Board:
             self.spawn_new_food()
 
     def get_game_object_at(self, x, y):
-        if self.board[x][y] is None:
-            return GameObject.EMPTY
-        if self.snake.contains_head(x, y):
-            return GameObject.SNAKE_HEAD
-        if self.snake.contains_body(x, y):
-            return GameObject.SNAKE_BODY
-        return self.board[x][y]
+        return GAME_OBJECTS[self.inner_cells[x, y]]
 
     def is_wall_at(self, x, y):
-        return self.board[x][y] == GameObject.WALL
+        return self.board.item(x, y) == GameObject.WALL
 
     def set_game_object_at(self, x, y, game_object):
-        self.board[x][y] = game_object
+        for positions, positions_object in ((self.food_positions, GameObject.FOOD),
+                                            (self.wall_positions, GameObject.WALL)):
+            if self.board.item(x, y) == positions_object:
+                positions.discard((x, y))
+            if game_object == positions_object:
+                positions.add((x, y))
+        self.board[x, y] = game_object
+        self.mark_dirty(x, y)
+
+    def add_snake(self, snake):
+        """
+        Puts another snake on the board at a random free cell. The snake gets the next number, its index in snakes.
+        See arena.py for letting the snakes on a board play together.
+        """
+        self.track_occupants()
+        max_snakes = int(np.iinfo(self.occupants.dtype).max) + 1
+        if len(self.snakes) >= max_snakes:
+            raise RuntimeError("A board can not hold more than {} snakes".format(max_snakes))
+        snake.number = len(self.snakes)
+        self.snakes.append(snake)
+        snake.x, snake.y = self.get_free_xy()
+        self.mark_dirty(snake.x, snake.y, snake)
+
+    def track_occupants(self):
+        """
+        Makes sure occupants is kept up to date, which is needed to let more than one snake play on the board.
+        """
+        if self.occupants is None:
+            self.occupants = np.full((self.width, self.height), -1, dtype=np.int16)
+            for snake in self.snakes:
+                for x, y in snake.body_cells:
+                    if 0 <= x < self.width and 0 <= y < self.height:
+                        self.occupants[x, y] = snake.number
+                if 0 <= snake.x < self.width and 0 <= snake.y < self.height:
+                    self.occupants[snake.x, snake.y] = snake.number
+
+    def mark_dirty(self, x, y, snake=None):
+        """
+        Tells the board that the cell has changed, this must be called after every change of a cell (including the
+        snake moving in or out of it). The cells and the free cells are updated right away, the drawing during the
+        next draw and the distances at the next question. Cells outside of the board are ignored.
+
+        :param snake: The snake that moved in or out of the cell. None for the snake in the cell, or the snake of the
+        board when the cell is empty.
+        """
+        self.dirty_cells.add((x, y))
+        if self.distance_field is not None:
+            self.distance_field.mark_dirty(x, y)
+        if 0 <= x < self.width and 0 <= y < self.height:
+            occupants = self.occupants
+            occupant = occupants[x, y] if occupants is not None else -1
+            if snake is None:
+                snake = self.snakes[occupant] if occupant != -1 else self.snake
+            if snake.contains_head(x, y):
+                value, occupant = GameObject.SNAKE_HEAD, snake.number
+            elif snake.contains_body(x, y):
+                value, occupant = GameObject.SNAKE_BODY, snake.number
+            elif occupant == -1 or occupant == snake.number:
+                value, occupant = self.board.item(x, y), -1
+            else:
+                # the snake left a cell another snake moved into in the same turn
+                return
+            if occupants is not None:
+                occupants[x, y] = occupant
+            if self.inner_cells.item(x, y) != value:
+                self.inner_cells[x, y] = value
+                self.update_free_cell(x, y, value == EMPTY)
+
+    def update_free_cell(self, x, y, is_free):
+        cell = x * self.height + y
+        index = self.free_cell_indices[cell]
+        if is_free and index == -1:
+            self.free_cell_indices[cell] = len(self.free_cells)
+            self.free_cells.append(cell)
+        elif not is_free and index != -1:
+            # move the last free cell into the place of this one
+            self.free_cell_indices[cell] = -1
+            last = self.free_cells.pop()
+            if last != cell:
+                self.free_cells[index] = last
+                self.free_cell_indices[last] = index
+
+    def count_free_cells(self):
+        """
+        :return: The number of cells without a snake, food or wall.
+        """
+        return len(self.free_cells)
+
+    def get_view(self, x, y, direction, radius):
+        """
+        Gives the part of the board around (x, y), turned such that the given direction faces north. The view is a
+        window on the cells of the board, nothing is copied.
+
+        :param x, y: The center of the view, normally the head of the snake.
+
+        :param direction: The Direction that should point up (north) in the view.
+
+        :param radius: The number of cells the view reaches in every direction from the center.
+
+        :return: A View with two fields. cells is a read-only (2 * radius + 1) x (2 * radius + 1) NumPy array of
+        GameObject values, indexed like the board: cells[radius][radius] is the center, cells[radius][radius - 1] is
+        the cell straight ahead and cells[radius + 1][radius] the cell to the right. Cells outside the board are
+        walls. food is a list of (x, y) positions of the food blocks relative to the center, turned the same way.
+        """
+        self.update_cells(radius)
+        left = x + self.cells_padding - radius
+        top = y + self.cells_padding - radius
+        cells = np.rot90(self.cells[left:left + 2 * radius + 1, top:top + 2 * radius + 1], -direction.value % 4)
+        cells.flags.writeable = False
+
+        food = []
+        for food_x, food_y in self.food_positions:
+            dx, dy = food_x - x, food_y - y
+            for i in range(direction.value):
+                dx, dy = dy, -dx
+            food.append((dx, dy))
+        return View(cells, food)
+
+    def update_cells(self, padding=0):
+        """
+        Makes sure there are at least the given number of walls around the board in the cells (see get_view).
+        """
+        if self.cells_padding < padding:
+            self.build_cells(padding)
+
+    def get_cells(self):
+        """
+        :return: A read-only board_width x board_height NumPy array with the GameObject values of all cells (snake
+        included). It is a view that is only valid until the board changes.
+        """
+        cells = self.inner_cells.view()
+        cells.flags.writeable = False
+        return cells
+
+    def get_distance_field(self):
+        """
+        :return: The DistanceField of the board, see distance.py. It is created at the first call and kept up to date
+        from then on.
+        """
+        if self.distance_field is None:
+            self.distance_field = DistanceField(self)
+        return self.distance_field
+
+    def build_cells(self, padding):
+        cells = np.full((self.width + 2 * padding, self.height + 2 * padding), GameObject.WALL, dtype=np.uint8)
+        inner_cells = cells[padding:padding + self.width, padding:padding + self.height]
+        if self.inner_cells is not None:
+            inner_cells[:] = self.inner_cells
+        else:
+            inner_cells[:] = self.board
+            for snake in self.snakes:
+                for x, y in snake.body_cells:
+                    if 0 <= x < self.width and 0 <= y < self.height:
+                        inner_cells[x, y] = GameObject.SNAKE_BODY
+                if 0 <= snake.x < self.width and 0 <= snake.y < self.height:
+                    inner_cells[snake.x, snake.y] = GameObject.SNAKE_HEAD
+        self.cells = cells
+        self.inner_cells = inner_cells
+        self.cells_padding = padding
+
+    def clear_drawing(self):
+        """
+        Forgets the drawn cells. Call this after removing them from the canvas (i.e. by canvas.delete("all")), the
+        next draw will then create all cells again.
+        """
+        self.cell_items = None
 
     def draw(self, canvas):
-        for x in range(0, self.width):
-            for y in range(0, self.height):
-                draw_x = x * self.block_width
-                draw_y = y * self.block_height
-                canvas.create_rectangle(draw_x, draw_y, draw_x + self.block_width, draw_y + self.block_height,
-                                        fill=self.get_game_object_at(x, y).getColor(), outline="")
+        """
+        Draws the board. The first time every cell gets its own rectangle, after that only the rectangles of the
+        cells marked as dirty are recolored, and only when their game object actually changed.
+        """
+        if self.cell_items is None or self.canvas is not canvas:
+            self.canvas = canvas
+            self.cell_items = [[None] * self.height for x in range(self.width)]
+            self.drawn_objects = self.inner_cells.copy()
+            colors = [game_object.getColor() if game_object is not None else None for game_object in GAME_OBJECTS]
+            for x, column in enumerate(self.drawn_objects.tolist()):
+                for y, value in enumerate(column):
+                    draw_x = x * self.block_width
+                    draw_y = y * self.block_height
+                    self.cell_items[x][y] = canvas.create_rectangle(draw_x, draw_y, draw_x + self.block_width,
+                                                                    draw_y + self.block_height,
+                                                                    fill=colors[value], outline="")
+        else:
+            for x, y in self.dirty_cells:
+                if 0 <= x < self.width and 0 <= y < self.height:
+                    value = self.inner_cells[x, y]
+                    if value != self.drawn_objects[x, y]:
+                        canvas.itemconfig(self.cell_items[x][y], fill=GAME_OBJECTS[value].getColor())
+                        self.drawn_objects[x, y] = value
+        self.dirty_cells.clear()
 
     def eat_food(self, x, y):
-        self.board[x][y] = GameObject.EMPTY
+        self.set_game_object_at(x, y, GameObject.EMPTY)
         self.spawn_new_food()
 
     def get_copy(self):
-        copy = [[GameObject.EMPTY for x in range(self.width)] for y in range(self.height)]
-        for x in range(self.width):
-            for y in range(self.height):
-                copy[x][y] = self.get_game_object_at(x, y)
-        return copy
+        return BoardCopy(self.inner_cells, frozenset(self.food_positions), frozenset(self.wall_positions), self)
 
     def get_copy_without_snake(self):
-        copy = [[GameObject.EMPTY for x in range(self.width)] for y in range(self.height)]
-        for x in range(self.width):
-            for y in range(self.height):
-                if not self.board[x][y] is None:
-                    copy[x][y] = self.board[x][y]
-        return copy
+        return BoardCopy(self.board, frozenset(self.food_positions), frozenset(self.wall_positions))
 
     def spawn_new_food(self):
         # self.set_game_object_at(0,0, GameObject.FOOD)
@@ -84,26 +327,6 @@ class Board:
         self.set_game_object_at(new_x, new_y, gameObjectType)
 
     def get_free_xy(self):
-        new_x = randint(0, self.width - 1)
-        new_y = randint(0, self.height - 1)
-        count = 0
-        # try to find a random position
-        while not (self.get_game_object_at(new_x, new_y) == GameObject.EMPTY) and count < self.max_random_tries:
-            count += 1
-            new_x = randint(0, self.width - 1)
-            new_y = randint(0, self.height - 1)
-
-        # if no random position could be guessed, try a more decent approach
-        if not self.get_game_object_at(new_x, new_y) == GameObject.EMPTY:
-            available = []
-            for x in range(self.width):
-                for y in range(self.height):
-                    if self.get_game_object_at(x, y) == GameObject.EMPTY:
-                        available.append((x, y))
-
-            if len(available) == 0:
-                raise RuntimeError("Congratulations, you broke the game by filling each cell of the board!")
-            else:
-                new_x, new_y = available[randint(0, len(available) - 1)]
-
-        return new_x, new_y
+        if len(self.free_cells) == 0:
+            raise RuntimeError("Congratulations, you broke the game by filling each cell of the board!")
+        return divmod(self.free_cells[self.rng.randint(0, len(self.free_cells) - 1)], self.height)
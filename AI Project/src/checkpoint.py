@@ -0,0 +1,290 @@
+"""
+Checkpoints of a learning agent: its Q-table, its counters (i.e. the epsilon schedule) and the state of its random
+number generator (agent.rng, the random module by default). A checkpoint directory contains:
+
+- q_table-<number>.npy: the Q-table of checkpoint <number> as a normal .npy file,
+- checkpoint.json: the number and file of the latest checkpoint together with the counters and the random state.
+
+checkpoint.json is replaced (atomically) only after the table is completely written, so a crash during a save
+leaves the previous checkpoint intact. When resuming, the table is memory-mapped copy-on-write: opening it is
+instant, only the parts that are used are read from disk and the changes are never written back to the file.
+
+Tables that are mostly zero can also be exported to a small compressed file with export_sparse.
+"""
+import json
+import os
+import random
+import re
+import threading
+import traceback
+
+import numpy as np
+
+from encoders import SparseQTable
+
+MANIFEST = "checkpoint.json"
+AGENT_COUNTERS = ["alpha", "gamma", "epsilon", "epsilon_decay", "min_epsilon", "depsilon", "total_moves",
+                  "total_penalties", "food"]
+TABLE_FILE_PATTERN = re.compile(r"q_table-(\d+)\.np[yz]$")
+
+
+def get_table_file(number):
+    return "q_table-{:06d}.npy".format(number)
+
+
+def read_manifest(directory):
+    """
+    :return: The contents of checkpoint.json in the directory, or None when there is no checkpoint yet.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def get_random(agent):
+    return getattr(agent, "rng", random)
+
+
+def get_agent_state(agent):
+    return {name: getattr(agent, name) for name in AGENT_COUNTERS if hasattr(agent, name)}
+
+
+def write_checkpoint(directory, number, q_table, agent_state, random_state, keep):
+    """
+    Writes a complete checkpoint. The table is written first, the manifest pointing to it last.
+    """
+    table_file = get_table_file(number)
+    table_path = os.path.join(directory, table_file)
+    if isinstance(q_table, SparseQTable):
+        # a sparse table can not be memory-mapped, so it is stored in the sparse format instead
+        table_file = table_file[:-len(".npy")] + ".npz"
+        table_path = os.path.join(directory, table_file)
+        export_sparse(q_table, table_path + ".tmp.npz")
+        os.replace(table_path + ".tmp.npz", table_path)
+    else:
+        with open(table_path + ".tmp", "wb") as file:
+            np.save(file, q_table)
+        os.replace(table_path + ".tmp", table_path)
+
+    manifest = {
+        "number": number,
+        "table": table_file,
+        "agent": agent_state,
+        "random_state": [random_state[0], list(random_state[1]), random_state[2]],
+    }
+    manifest_path = os.path.join(directory, MANIFEST)
+    with open(manifest_path + ".tmp", "w") as file:
+        json.dump(manifest, file)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    # remove the tables of old checkpoints, an old table may still be in use (memory-mapped) on some systems
+    for file_name in os.listdir(directory):
+        match = TABLE_FILE_PATTERN.match(file_name)
+        if match is not None and int(match.group(1)) <= number - keep:
+            try:
+                os.remove(os.path.join(directory, file_name))
+            except OSError:
+                pass
+
+
+def save_checkpoint(agent, directory, keep=2):
+    """
+    Saves a checkpoint of the agent and waits until it is written.
+
+    :param keep: The number of checkpoints to keep, the tables of older ones are removed.
+    """
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    number = manifest["number"] + 1 if manifest is not None else 0
+    write_checkpoint(directory, number, agent.q_table, get_agent_state(agent), get_random(agent).getstate(), keep)
+
+
+def load_checkpoint(agent, directory, mmap=True, restore_random_state=True):
+    """
+    Resumes the agent from the latest checkpoint in the directory.
+
+    :param mmap: Whether to memory-map the table (copy-on-write) instead of reading it into memory.
+
+    :param restore_random_state: Whether the random numbers of the agent should continue where they were at the
+    checkpoint.
+
+    :return: True if a checkpoint was loaded, False if there is no checkpoint in the directory.
+    """
+    manifest = read_manifest(directory)
+    if manifest is None:
+        return False
+    table_path = os.path.join(directory, manifest["table"])
+    if table_path.endswith(".npz"):
+        agent.q_table = import_sparse(table_path, dense=False)
+    else:
+        agent.q_table = np.load(table_path, mmap_mode="c" if mmap else None)
+    for name, value in manifest["agent"].items():
+        setattr(agent, name, value)
+    if restore_random_state:
+        version, state, gauss_next = manifest["random_state"]
+        get_random(agent).setstate((version, tuple(state), gauss_next))
+    return True
+
+
+class Checkpointer:
+    """
+    Saves a checkpoint every so many turns without holding up the game. The table is written by a forked child
+    process, which sees a copy-on-write snapshot of the memory, so the game only waits for the fork itself. Where
+    fork is not available, or when the process runs other threads (i.e. the window of main.py), the table is written
+    by a background thread instead: a forked child only gets the thread that forked, and it can hang on a lock that
+    one of the other threads held at the time of the fork. The thread writes the live table while the game goes on,
+    so such a checkpoint can already contain some of the updates of the turns after it was started. The counters and
+    the random state are always those of the turn of the save.
+    """
+
+    def __init__(self, agent, directory, every_tics=100000, keep=2):
+        """
+        :param agent: The agent to save.
+
+        :param directory: The checkpoint directory, it is created if needed.
+
+        :param every_tics: The number of turns between two checkpoints.
+
+        :param keep: The number of checkpoints to keep.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.agent = agent
+        self.directory = directory
+        self.every_tics = every_tics
+        self.keep = keep
+        manifest = read_manifest(directory)
+        self.number = manifest["number"] if manifest is not None else -1
+        self.tics = 0
+        self.child = None
+        self.thread = None
+        # the error of the background thread, None when it did not fail
+        self.thread_error = None
+
+    def tick(self):
+        """
+        Call this every turn. It starts a checkpoint when it is time for one and the previous one is finished,
+        otherwise it is tried again next turn.
+        """
+        self.tics += 1
+        if self.tics >= self.every_tics and self.save():
+            self.tics = 0
+
+    def busy(self):
+        """
+        :return: Whether the previous checkpoint is still being written.
+
+        :raise RuntimeError: When writing the previous checkpoint failed.
+        """
+        if self.child is not None:
+            pid, status = os.waitpid(self.child, os.WNOHANG)
+            if pid == 0:
+                return True
+            self.finish_child(status)
+        if self.thread is not None:
+            if self.thread.is_alive():
+                return True
+            self.finish_thread()
+        return False
+
+    def finish_child(self, status):
+        self.child = None
+        exit_code = os.waitstatus_to_exitcode(status)
+        if exit_code != 0:
+            # the child printed its traceback
+            raise RuntimeError("writing checkpoint {} failed (exit code {})".format(self.number, exit_code))
+
+    def finish_thread(self):
+        self.thread = None
+        error, self.thread_error = self.thread_error, None
+        if error is not None:
+            raise RuntimeError("writing checkpoint {} failed".format(self.number)) from error
+
+    def write_in_thread(self, *args):
+        try:
+            write_checkpoint(*args)
+        except BaseException as error:
+            self.thread_error = error
+
+    def save(self):
+        """
+        Starts writing a checkpoint in the background.
+
+        :return: False if the previous checkpoint is still being written, in which case nothing is saved.
+
+        :raise RuntimeError: When writing the previous checkpoint failed.
+        """
+        if self.busy():
+            return False
+        self.number += 1
+        args = (self.directory, self.number, self.agent.q_table, get_agent_state(self.agent),
+                get_random(self.agent).getstate(), self.keep)
+        if hasattr(os, "fork") and threading.active_count() == 1:
+            pid = os.fork()
+            if pid == 0:
+                status = 0
+                try:
+                    write_checkpoint(*args)
+                except BaseException:
+                    traceback.print_exc()
+                    status = 1
+                finally:
+                    os._exit(status)
+            self.child = pid
+        else:
+            # copying a table of gigabytes would hold up the game for seconds, so the table is not copied. Only the
+            # dict of a sparse table is, because the game adds rows to it while the thread goes over them
+            q_table = self.agent.q_table
+            if isinstance(q_table, SparseQTable):
+                rows = q_table
+                q_table = SparseQTable(rows.nr_actions, rows.dtype)
+                q_table.update(rows)
+            self.thread = threading.Thread(target=self.write_in_thread, args=(args[0], args[1], q_table) + args[3:])
+            self.thread.start()
+        return True
+
+    def wait(self):
+        """
+        Waits until the checkpoint that is being written is finished.
+
+        :raise RuntimeError: When writing it failed.
+        """
+        if self.child is not None:
+            pid, status = os.waitpid(self.child, 0)
+            self.finish_child(status)
+        if self.thread is not None:
+            self.thread.join()
+            self.finish_thread()
+
+
+def export_sparse(q_table, path):
+    """
+    Saves only the non-zero rows of the Q-table in a compressed .npz file. Works for dense and sparse tables.
+    """
+    if isinstance(q_table, SparseQTable):
+        states = np.array(sorted(state for state, row in q_table.items() if row.any()), dtype=np.int64)
+        rows = np.array([q_table[state] for state in states], dtype=q_table.dtype).reshape(-1, q_table.nr_actions)
+        shape = np.array([-1, q_table.nr_actions])
+    else:
+        states = np.flatnonzero(np.asarray(q_table).any(axis=1))
+        rows = np.asarray(q_table)[states]
+        shape = np.array(q_table.shape)
+    np.savez_compressed(path, states=states, rows=rows, shape=shape)
+
+
+def import_sparse(path, dense=True):
+    """
+    Loads a table saved by export_sparse.
+
+    :param dense: Whether to return a dense array (only possible when a dense table was exported) or a SparseQTable.
+    """
+    with np.load(path) as data:
+        states, rows, shape = data["states"], data["rows"], data["shape"]
+    if dense and shape[0] >= 0:
+        q_table = np.zeros(tuple(shape), dtype=rows.dtype)
+        q_table[states] = rows
+        return q_table
+    q_table = SparseQTable(int(shape[1]), rows.dtype)
+    q_table.update((int(state), row) for state, row in zip(states, rows))
+    return q_table
@@ -0,0 +1,174 @@
+"""
+Distance to the nearest food block for every cell of a board, for agents that plan paths. The distances are kept up
+to date while the game is played, so an agent can ask for the distance and the first step towards food in constant
+time instead of searching the board every turn:
+
+    field = board.get_distance_field()
+    field.get_distance(x, y)     # number of moves to the nearest food block, -1 when no food can be reached
+    field.get_direction(x, y)    # Direction of the first move of a shortest path
+
+A path may only go through empty cells and food, never through walls, the body or the head of the snake. The cell
+of the query itself does not have to be free, so asking for the position of the head gives the distance from the head.
+
+The board tells the field which cells changed (see Board.mark_dirty). Before answering, the field repairs only the
+part of the board that is affected by those changes: when a cell is taken (the head moves in, a food block is eaten)
+the cells whose shortest path went through it are searched again, when a cell is freed (the tail moves out) or food
+spawns, the shorter paths are spread from there.
+"""
+import heapq
+
+from gameobjects import GameObject
+from move import Direction, OFF_BOARD, get_next_cell_table
+
+UNREACHABLE = float("inf")
+
+
+class DistanceField:
+
+    def __init__(self, board):
+        """
+        Creates the field for the board and computes all distances. Use Board.get_distance_field to get the field of
+        a board, so it is told about every change.
+        """
+        self.board = board
+        self.width = board.width
+        self.height = board.height
+        nr_cells = board.width * board.height
+        next_cell = get_next_cell_table(board.width, board.height)
+        # neighbours of every cell as (cell, direction) pairs, cell x * height + y is (x, y)
+        self.neighbours = [tuple((int(next_cell[cell, direction.value, 1]), direction) for direction in Direction
+                                 if next_cell[cell, direction.value, 1] != OFF_BOARD) for cell in range(nr_cells)]
+        self.free = [False] * nr_cells
+        self.food = [False] * nr_cells
+        self.distances = [UNREACHABLE] * nr_cells
+        self.changed_cells = set()
+        for x in range(self.width):
+            for y in range(self.height):
+                self.free[x * self.height + y], self.food[x * self.height + y] = self.get_cell_state(x, y)
+        self.rebuild()
+
+    def get_cell_state(self, x, y):
+        """
+        :return: A tuple (free, food): whether a path may go through the cell and whether it holds food.
+        """
+        game_object = self.board.get_game_object_at(x, y)
+        return game_object == GameObject.EMPTY or game_object == GameObject.FOOD, game_object == GameObject.FOOD
+
+    def mark_dirty(self, x, y):
+        """
+        Called by the board for every changed cell, the distances are repaired at the next question.
+        """
+        if 0 <= x < self.width and 0 <= y < self.height:
+            self.changed_cells.add(x * self.height + y)
+
+    def rebuild(self):
+        """
+        Computes all distances from scratch with a breadth first search from all food blocks.
+        """
+        self.changed_cells.clear()
+        self.distances = [0 if food else UNREACHABLE for food in self.food]
+        queue = [cell for cell, food in enumerate(self.food) if food]
+        for cell in queue:
+            distance = self.distances[cell] + 1
+            for neighbour, direction in self.neighbours[cell]:
+                if self.free[neighbour] and self.distances[neighbour] > distance:
+                    self.distances[neighbour] = distance
+                    queue.append(neighbour)
+
+    def update(self):
+        """
+        Repairs the distances after the changes the board reported. This is called by every question, so there is
+        normally no need to call it.
+        """
+        if len(self.changed_cells) == 0:
+            return
+        seeds = []
+        for cell in self.changed_cells:
+            state = self.get_cell_state(cell // self.height, cell % self.height)
+            if state != (self.free[cell], self.food[cell]):
+                self.free[cell], self.food[cell] = state
+                seeds.append(cell)
+        self.changed_cells.clear()
+        distances = self.distances
+        free = self.free
+
+        # find the cells that lost their shortest path: the changed cells and, level by level, every cell that has
+        # no neighbour one step closer to food that still has its path
+        affected = set(seeds)
+        queue = [(distances[cell], cell) for cell in seeds if distances[cell] != UNREACHABLE]
+        heapq.heapify(queue)
+        while queue:
+            distance, cell = heapq.heappop(queue)
+            for neighbour, direction in self.neighbours[cell]:
+                if neighbour in affected or distances[neighbour] != distance + 1:
+                    continue
+                if not any(distances[other] == distance and other not in affected
+                           for other, other_direction in self.neighbours[neighbour]):
+                    affected.add(neighbour)
+                    heapq.heappush(queue, (distance + 1, neighbour))
+            if len(affected) > len(distances) // 4:
+                # i.e. the only food block was eaten, starting over is cheaper than repairing
+                self.rebuild()
+                return
+
+        # give the affected cells the best distance through the cells around them that kept their path
+        for cell in affected:
+            distances[cell] = UNREACHABLE
+        for cell in affected:
+            if self.food[cell]:
+                distances[cell] = 0
+            elif free[cell]:
+                distances[cell] = min((distances[neighbour] for neighbour, direction in self.neighbours[cell]
+                                       if neighbour not in affected), default=UNREACHABLE) + 1
+            if distances[cell] != UNREACHABLE:
+                queue.append((distances[cell], cell))
+
+        # spread the new distances, which also lowers the cells that got closer to food by a freed cell or new food
+        heapq.heapify(queue)
+        while queue:
+            distance, cell = heapq.heappop(queue)
+            if distance > distances[cell]:
+                continue
+            for neighbour, direction in self.neighbours[cell]:
+                if free[neighbour] and distances[neighbour] > distance + 1:
+                    distances[neighbour] = distance + 1
+                    heapq.heappush(queue, (distance + 1, neighbour))
+
+    def get_distance(self, x, y):
+        """
+        :return: The number of moves from (x, y) to the nearest food block, 0 when (x, y) is free and holds food
+        and -1 when no food can be reached.
+        """
+        self.update()
+        cell = x * self.height + y
+        if self.free[cell]:
+            distance = self.distances[cell]
+        else:
+            distance = min((self.distances[neighbour] for neighbour, direction in self.neighbours[cell]),
+                           default=UNREACHABLE) + 1
+        return int(distance) if distance != UNREACHABLE else -1
+
+    def get_direction(self, x, y):
+        """
+        :return: The Direction of the first move of a shortest path from (x, y) to food, None when no food can be
+        reached or (x, y) holds food.
+        """
+        self.update()
+        best_distance, best_direction = UNREACHABLE, None
+        for neighbour, direction in self.neighbours[x * self.height + y]:
+            if self.distances[neighbour] < best_distance:
+                best_distance, best_direction = self.distances[neighbour], direction
+        if best_direction is None or (self.free[x * self.height + y] and self.distances[x * self.height + y] == 0):
+            return None
+        return best_direction
+
+    def get_next_step(self, x, y):
+        """
+        :return: The (x, y) position of the first move of a shortest path from (x, y) to food, None when there is no
+        such move (see get_direction).
+        """
+        direction = self.get_direction(x, y)
+        if direction is None:
+            return None
+        dx, dy = direction.get_xy_manipulation()
+        return x + dx, y + dy
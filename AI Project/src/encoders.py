@@ -0,0 +1,223 @@
+"""
+State encoders for the tabular agent. A state encoder turns what the agent sees in get_move (the board, its direction
+and the position of its head) into a single integer: the index of the state in the Q-table.
+
+Every encoder describes the state as a few small features, each with a fixed number of possible values
+(feature_sizes). The features are packed into one index, so a Q-table has nr_states rows and one column per move.
+When there are too many states for a dense table, create_q_table gives a dictionary that only stores the visited
+states instead.
+"""
+import numpy as np
+
+from board import View
+from gameobjects import GAME_OBJECTS, GameObject
+from move import DX_TABLE, DY_TABLE, NEW_DIRECTION_TABLE, Move
+
+# number of possible moves, the column of a move in the Q-table is move.value + 1
+NR_ACTIONS = 3
+
+
+def move_to_action(move):
+    return move.value + 1
+
+
+def action_to_move(action):
+    return Move(int(action) - 1)
+
+
+def to_view_offset(dx, dy, direction):
+    """
+    Turns an offset on the board such that the given direction faces north, like the cells of a View.
+    """
+    for i in range(direction.value):
+        dx, dy = dy, -dx
+    return dx, dy
+
+
+def to_board_offset(dx, dy, direction):
+    """
+    Turns an offset in a View (facing north) back to an offset on the board.
+    """
+    for i in range(direction.value):
+        dx, dy = -dy, dx
+    return dx, dy
+
+
+def look(board, direction, head_position, move):
+    """
+    Gives what the snake would run into when making the given move.
+
+    :param board: The board as given to Agent.get_move, either a full copy of the board or a View.
+
+    :return: The GameObject in the cell the move leads to, or None when the move leaves the board. A View shows
+    everything outside of the board as a wall, so for a View None is never returned.
+    """
+    if isinstance(board, View):
+        radius = len(board.cells) // 2
+        dx, dy = {Move.LEFT: (-1, 0), Move.STRAIGHT: (0, -1), Move.RIGHT: (1, 0)}[move]
+        return GAME_OBJECTS[board.cells[radius + dx][radius + dy]]
+    dx, dy = direction.get_new_direction(move).get_xy_manipulation()
+    x, y = head_position[0] + dx, head_position[1] + dy
+    width, height = board.shape
+    if 0 <= x < width and 0 <= y < height:
+        return GAME_OBJECTS[board[x, y]]
+    return None
+
+
+def get_food_offsets(board, direction, head_position):
+    """
+    :return: A list with the positions of all food blocks relative to the head, turned such that the snake faces
+    north (like View.food).
+    """
+    if isinstance(board, View):
+        return board.food
+    return [to_view_offset(x - head_position[0], y - head_position[1], direction) for x, y in board.food_positions]
+
+
+class SparseQTable(dict):
+    """
+    Q-table that only stores the states that have been visited. It is indexed like a dense table: q_table[state] is
+    the row with the values of all moves in that state.
+    """
+
+    def __init__(self, nr_actions=NR_ACTIONS, dtype=np.float32):
+        super().__init__()
+        self.nr_actions = nr_actions
+        self.dtype = dtype
+
+    def __missing__(self, state):
+        row = np.zeros(self.nr_actions, dtype=self.dtype)
+        self[state] = row
+        return row
+
+
+class StateEncoder:
+    """
+    Base class of the state encoders. Subclasses set feature_sizes and implement get_features.
+    """
+    feature_sizes = ()
+
+    @property
+    def nr_states(self):
+        nr_states = 1
+        for size in self.feature_sizes:
+            nr_states *= size
+        return nr_states
+
+    def get_features(self, board, direction, head_position):
+        """
+        :return: A tuple with one integer per feature, feature i being in range(feature_sizes[i]).
+        """
+        raise NotImplementedError
+
+    def encode(self, board, direction, head_position):
+        """
+        :return: The index of the state in the Q-table, in range(nr_states).
+        """
+        return self.pack(self.get_features(board, direction, head_position))
+
+    def pack(self, features):
+        index = 0
+        for feature, size in zip(features, self.feature_sizes):
+            index = index * size + feature
+        return index
+
+    def unpack(self, index):
+        features = []
+        for size in reversed(self.feature_sizes):
+            index, feature = divmod(index, size)
+            features.append(feature)
+        return tuple(reversed(features))
+
+    def get_all_features(self):
+        """
+        :return: A tuple with one array per feature, holding the value of that feature for every state in order.
+        """
+        return np.unravel_index(np.arange(self.nr_states), self.feature_sizes)
+
+    def get_action_mask(self):
+        """
+        :return: A boolean array of shape (nr_states, 3) that is False for the moves the state shows to be fatal,
+        except in the states where every move is. By default every move is allowed.
+        """
+        return np.ones((self.nr_states, NR_ACTIONS), dtype=bool)
+
+    def create_q_table(self, max_dense_states=1 << 20):
+        """
+        :return: A dense float32 array of shape (nr_states, 3) when there are at most max_dense_states states,
+        otherwise a SparseQTable.
+        """
+        if self.nr_states <= max_dense_states:
+            return np.zeros((self.nr_states, NR_ACTIONS), dtype=np.float32)
+        return SparseQTable()
+
+
+class RelativeStateEncoder(StateEncoder):
+    """
+    Describes the state as seen from the snake, so the same Q-table works on any board size:
+
+    - whether the nearest food is ahead of, level with or behind the head,
+    - whether the nearest food is to the left, in line with or to the right of the head,
+    - whether moving left, straight or right runs into a wall, the body or out of the board,
+    - the direction the snake is facing.
+    """
+    feature_sizes = (3, 3, 2, 2, 2, 4)
+
+    def get_features(self, board, direction, head_position):
+        food_offsets = get_food_offsets(board, direction, head_position)
+        if len(food_offsets) > 0:
+            dx, dy = min(food_offsets, key=lambda offset: abs(offset[0]) + abs(offset[1]))
+        else:
+            dx, dy = 0, 0
+        food_ahead = 1 - int(np.sign(dy))
+        food_side = 1 + int(np.sign(dx))
+        dangers = tuple(int(self.is_danger(look(board, direction, head_position, move)))
+                        for move in (Move.LEFT, Move.STRAIGHT, Move.RIGHT))
+        return (food_ahead, food_side) + dangers + (direction.value,)
+
+    @staticmethod
+    def is_danger(game_object):
+        return game_object is None or game_object in (GameObject.WALL, GameObject.SNAKE_BODY)
+
+    def get_action_mask(self):
+        """
+        Moves into a danger are not allowed. This is stricter than Agent, which only avoids leaving the board, but the
+        state does not tell leaving the board apart from the other dangers.
+        """
+        features = self.get_all_features()
+        mask = np.stack([features[2] == 0, features[3] == 0, features[4] == 0], axis=1)
+        mask[~mask.any(axis=1)] = True
+        return mask
+
+
+class AbsoluteStateEncoder(StateEncoder):
+    """
+    Describes the state by the position of the head, the direction and the position of the food on the board (the
+    food block that comes first in the order of the board when there are more). The Q-table only fits boards of the
+    given size.
+    """
+
+    def __init__(self, board_width, board_height):
+        self.board_width = board_width
+        self.board_height = board_height
+        self.feature_sizes = (board_width, board_height, 4, board_width, board_height)
+
+    def get_features(self, board, direction, head_position):
+        x, y = head_position
+        food_offsets = get_food_offsets(board, direction, head_position)
+        if len(food_offsets) > 0:
+            food_x, food_y = min((x + dx, y + dy) for dx, dy in
+                                 (to_board_offset(ex, ey, direction) for ex, ey in food_offsets))
+        else:
+            food_x, food_y = x, y
+        return x, y, direction.value, food_x, food_y
+
+    def get_action_mask(self):
+        """
+        Moves that leave the board are not allowed, like in Agent.
+        """
+        x, y, direction = self.get_all_features()[:3]
+        new_directions = NEW_DIRECTION_TABLE[direction]
+        new_x = x[:, None] + DX_TABLE[new_directions]
+        new_y = y[:, None] + DY_TABLE[new_directions]
+        return (new_x >= 0) & (new_x < self.board_width) & (new_y >= 0) & (new_y < self.board_height)
@@ -0,0 +1,130 @@
+"""
+Frozen policies: a trained Q-table compiled into the best move of every state, for evaluating and showing an agent
+without the cost of training it. The policy is an int8 array with one action (the column of the move in the Q-table)
+per state, with the moves the state shows to be fatal masked out (see StateEncoder.get_action_mask). Every move of
+the FrozenAgent is a single lookup in it: no exploring, no learning and no printing.
+
+Compile a table once:
+
+    python frozen.py q_table.npy --output policy.npy
+
+and play with it, for instance with "python headless.py --policy policy.npy --tics 100000" (add --absolute for a
+policy compiled with --absolute) or from Python:
+
+    snake.agent = FrozenAgent(load_policy("policy.npy"))
+
+The policy is loaded memory-mapped, so loading is instant whatever the size of the table. Without exploring, a snake
+can circle forever without eating, so evaluate with starvation turned on.
+"""
+import argparse
+
+import numpy as np
+
+from encoders import AbsoluteStateEncoder, NR_ACTIONS, RelativeStateEncoder, SparseQTable, action_to_move
+
+ACTION_MOVES = tuple(action_to_move(action) for action in range(NR_ACTIONS))
+
+
+def compile_policy(q_table, state_encoder=None):
+    """
+    :param q_table: A dense Q-table or a SparseQTable.
+
+    :param state_encoder: The state encoder the table belongs to, by default the RelativeStateEncoder.
+
+    :return: An int8 array with the best allowed action of every state. Like Agent, the first action wins a tie, so a
+    state that was never visited gets its first allowed action.
+    """
+    state_encoder = state_encoder if state_encoder is not None else RelativeStateEncoder()
+    mask = state_encoder.get_action_mask()
+    if isinstance(q_table, SparseQTable):
+        # unvisited states have all values zero, so the first allowed action
+        actions = mask.argmax(axis=1).astype(np.int8)
+        for state, row in q_table.items():
+            actions[state] = np.where(mask[state], row, -np.inf).argmax()
+        return actions
+    if len(q_table) != state_encoder.nr_states:
+        raise ValueError("the Q-table has {} states, the state encoder {}".format(len(q_table),
+                                                                                state_encoder.nr_states))
+    return np.where(mask, q_table, -np.inf).argmax(axis=1).astype(np.int8)
+
+
+def save_policy(path, actions):
+    np.save(path, actions)
+
+
+def load_policy(path):
+    """
+    :return: The policy saved with save_policy, memory-mapped read-only.
+    """
+    return np.load(path, mmap_mode="r")
+
+
+class FrozenAgent:
+    """
+    Agent that always makes the move of a compiled policy.
+    """
+
+    def __init__(self, actions, state_encoder=None):
+        """
+        :param actions: A policy made by compile_policy (or loaded with load_policy).
+
+        :param state_encoder: The state encoder of the Q-table the policy was compiled from, by default the
+        RelativeStateEncoder.
+        """
+        self.state_encoder = state_encoder if state_encoder is not None else RelativeStateEncoder()
+        if len(actions) != self.state_encoder.nr_states:
+            raise ValueError("the policy has {} states, the state encoder {}".format(len(actions),
+                                                                                   self.state_encoder.nr_states))
+        self.actions = actions
+
+    def get_move(self, board, score, turns_alive, turns_to_starve, direction, head_position, body_parts):
+        return ACTION_MOVES[self.actions[self.state_encoder.encode(board, direction, head_position)]]
+
+    def should_redraw_board(self):
+        return True
+
+    def get_view_radius(self):
+        return -1
+
+    def should_grow_on_food_collision(self):
+        return False
+
+    def on_die(self, head_position, board, score, body_parts):
+        pass
+
+
+def main(argv=None):
+    # imported here, headless itself uses this module for its --policy
+    from headless import add_game_arguments, create_game, run
+
+    parser = argparse.ArgumentParser(description="Compile a Q-table into a frozen policy.")
+    parser.add_argument("q_table", help="Q-table (.npy) to compile")
+    parser.add_argument("--output", default=None, help="file (.npy) to save the policy to")
+    parser.add_argument("--absolute", action="store_true",
+                        help="the table belongs to the AbsoluteStateEncoder of a --width x --height board")
+    parser.add_argument("--play", type=int, default=0, metavar="TICS", help="play this many turns with the policy")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the game played with --play, i.e. the --seed of a table made by planner.py")
+    add_game_arguments(parser)
+    args = parser.parse_args(argv)
+
+    state_encoder = AbsoluteStateEncoder(args.width, args.height) if args.absolute else RelativeStateEncoder()
+    actions = compile_policy(np.load(args.q_table), state_encoder)
+    if args.output is not None:
+        save_policy(args.output, actions)
+    print("Compiled {} states".format(len(actions)))
+
+    if args.play > 0:
+        snake, board = create_game(args.width, args.height, args.food, args.walls, args.test_config,
+                                   args.starvation, args.seed)
+        snake.agent = FrozenAgent(actions, state_encoder)
+        result = run(max_tics=args.play, snake=snake, board=board)
+        print("Turns: {}. Episodes: {}. Total score: {}. Best score: {}. Time: {:.2f}s ({:.0f} turns/s)".format(
+            result.tics, result.episodes, result.total_score, result.best_score, result.seconds,
+            result.tics / result.seconds if result.seconds > 0 else 0))
+        # a good policy can play the whole time without dying, its score is then only in the unfinished episode
+        print("Unfinished episode: {} turns, score {}".format(snake.tics_alive, snake.score))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
-from enum import Enum
+from enum import Enum, IntEnum
 from collections import namedtuple
 
 
-class GameObject(Enum):
+# an IntEnum, so the uint8 cells of the board (see board.py) compare equal to the members
+class GameObject(IntEnum):
     WALL = 1
     FOOD = 2
     EMPTY = 3
@@ -10,14 +11,19 @@ class GameObject(Enum):
     SNAKE_BODY = 5
 
     def getColor(self):
-        m = {
-            GameObject.WALL: "#000000",
-            GameObject.FOOD: "#8A2BE2",
-            GameObject.EMPTY: "#d3d3d3",
-            GameObject.SNAKE_HEAD: "#FF7F50",
-            GameObject.SNAKE_BODY: "#FF6347"
-        }
-        return m.get(self, "#ffffff")
+        return GAME_OBJECT_COLORS.get(self, "#ffffff")
+
+
+GAME_OBJECT_COLORS = {
+    GameObject.WALL: "#000000",
+    GameObject.FOOD: "#8A2BE2",
+    GameObject.EMPTY: "#d3d3d3",
+    GameObject.SNAKE_HEAD: "#FF7F50",
+    GameObject.SNAKE_BODY: "#FF6347"
+}
+
+# the GameObject of every value, GAME_OBJECTS[value] is a lot faster than GameObject(value)
+GAME_OBJECTS = (None,) + tuple(GameObject)
 
 
 Color = namedtuple('Color', ['value', 'displayString'])
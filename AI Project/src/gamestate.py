@@ -0,0 +1,263 @@
+"""
+A compact copy of a game, for agents that want to look ahead: the state can be cloned in about a microsecond and then
+played on with step, which follows the rules of Snake.update. An agent can so try out thousands of futures per move
+without touching the real snake and board:
+
+    state = create_state(board, direction, head_position, body_parts, turns_to_starve)   # in get_move
+    for move in (Move.LEFT, Move.STRAIGHT, Move.RIGHT):
+        future = state.clone()
+        if not future.step(move):
+            ...
+
+The cells of the board are kept in one bytearray of GameObject values (cell x * height + y) and the body in a ring
+buffer of cell numbers. Clones share these buffers until one of them makes a move, which copies them first (copy on
+write), so a clone that is never played costs nothing but the clone itself. The walls never change and are shared by
+all clones.
+
+New food appears at a random free cell, like in the real game. The random numbers are part of the state, so two
+clones of one state see the same food, but not the food the real game will place (which no agent can know).
+"""
+import random
+from array import array
+
+import numpy as np
+
+from board import BoardCopy
+from gameobjects import GAME_OBJECTS, GameObject
+
+# multiplier and increment of the 64 bit linear congruential generator that places the food
+RNG_MULTIPLIER = 6364136223846793005
+RNG_INCREMENT = 1442695040888963407
+RNG_MASK = (1 << 64) - 1
+# the number of random cells tried before food is placed at a free cell found by going over all cells
+MAX_FOOD_TRIES = 16
+# the values of the game objects as plain ints, comparing a cell with these is a lot faster than with the members
+WALL, FOOD, EMPTY, SNAKE_HEAD, SNAKE_BODY = (int(game_object) for game_object in (
+    GameObject.WALL, GameObject.FOOD, GameObject.EMPTY, GameObject.SNAKE_HEAD, GameObject.SNAKE_BODY))
+
+
+class GameState:
+    __slots__ = ('width', 'height', 'cells', 'wall_positions', 'food', 'x', 'y', 'direction', 'body', 'tail_index',
+                 'length', 'size', 'grow', 'score', 'tics_alive', 'tics_to_starve', 'max_tics_to_starve', 'alive',
+                 'rng_state', 'shared')
+
+    def __init__(self, width, height, cells, wall_positions, food, x, y, direction, body, size, grow, score,
+                 tics_alive, tics_to_starve, max_tics_to_starve, rng_state):
+        """
+        Use create_state or get_state to make a state of a game.
+
+        :param cells: A bytearray with the GameObject value of every cell (x * height + y), snake included.
+
+        :param food: A list with the cell numbers of the food blocks.
+
+        :param body: An array('i') with the cell numbers of the body, from the tail to the part directly following
+        the head.
+
+        :param size: The number of body parts the snake grows to, see Snake.size.
+
+        :param grow: Whether the snake grows when it eats, see Agent.should_grow_on_food_collision.
+        """
+        self.width = width
+        self.height = height
+        self.cells = cells
+        self.wall_positions = wall_positions
+        self.food = food
+        self.x = x
+        self.y = y
+        self.direction = direction
+        # the body is the first length cells of the ring buffer from body[tail_index] on, wrapping around at the end
+        self.body = body
+        self.tail_index = 0
+        self.length = len(body)
+        self.size = size
+        self.grow = grow
+        self.score = score
+        self.tics_alive = tics_alive
+        self.tics_to_starve = tics_to_starve
+        self.max_tics_to_starve = max_tics_to_starve
+        self.alive = True
+        self.rng_state = rng_state
+        # whether the cells, food and body may be used by another clone, they are then copied before a change
+        self.shared = False
+
+    def clone(self):
+        """
+        :return: A state that can be played on without changing this one.
+        """
+        clone = GameState.__new__(GameState)
+        clone.width, clone.height = self.width, self.height
+        clone.cells, clone.wall_positions, clone.food = self.cells, self.wall_positions, self.food
+        clone.x, clone.y, clone.direction = self.x, self.y, self.direction
+        clone.body, clone.tail_index, clone.length = self.body, self.tail_index, self.length
+        clone.size, clone.grow, clone.score, clone.tics_alive = self.size, self.grow, self.score, self.tics_alive
+        clone.tics_to_starve, clone.max_tics_to_starve = self.tics_to_starve, self.max_tics_to_starve
+        clone.alive, clone.rng_state = self.alive, self.rng_state
+        self.shared = True
+        clone.shared = True
+        return clone
+
+    def step(self, move):
+        """
+        Makes a move by the rules of the game: the snake starves, dies by leaving the board or running into a wall or
+        a snake, or moves on and eats the food it moved onto. Other snakes on the board (see arena.py) are taken to
+        stand still. The cells of a snake that died are left as they were before the move.
+
+        :param move: The Move to make.
+
+        :return: Whether the snake died.
+        """
+        if not self.alive:
+            raise RuntimeError("the snake of this state has already died")
+        if self.tics_to_starve == 0:
+            self.alive = False
+            return True
+        direction = self.direction.get_new_direction(move)
+        dx, dy = direction.get_xy_manipulation()
+        x, y = self.x + dx, self.y + dy
+        self.direction = direction
+        self.x, self.y = x, y
+        if x < 0 or x >= self.width or y < 0 or y >= self.height:
+            self.alive = False
+            return True
+        cell = x * self.height + y
+        value = self.cells[cell]
+        # the tail moves on in the same turn, unless the snake is still growing
+        frees_tail = self.length > 0 and self.length >= self.size
+        if value == WALL or value == SNAKE_HEAD or \
+                (value == SNAKE_BODY and not (frees_tail and cell == self.body[self.tail_index])):
+            self.alive = False
+            return True
+
+        if self.shared:
+            self.cells = bytearray(self.cells)
+            self.body = self.body[:]
+            self.food = self.food[:]
+            self.shared = False
+        cells = self.cells
+        old_head = (x - dx) * self.height + y - dy
+        if self.size > 0:
+            self.push_body(old_head)
+            cells[old_head] = SNAKE_BODY
+        else:
+            cells[old_head] = EMPTY
+        while self.length > self.size:
+            tail = self.body[self.tail_index]
+            self.tail_index = (self.tail_index + 1) % len(self.body)
+            self.length -= 1
+            cells[tail] = EMPTY
+        cells[cell] = SNAKE_HEAD
+
+        if value == FOOD:
+            if self.grow:
+                self.size += 1
+            self.score += 1
+            self.food.remove(cell)
+            self.spawn_food()
+            if self.max_tics_to_starve != -1:
+                self.tics_to_starve = self.max_tics_to_starve + 1
+        self.tics_alive += 1
+        if self.max_tics_to_starve != -1:
+            self.tics_to_starve -= 1
+        return False
+
+    def push_body(self, cell):
+        """
+        Adds the cell after the last body part, making the ring buffer larger when it is full.
+        """
+        body = self.body
+        if self.length == len(body):
+            # unroll the ring with the tail first, with room to grow
+            body = body[self.tail_index:] + body[:self.tail_index]
+            body.extend(body if len(body) > 0 else array('i', [0] * 8))
+            self.body = body
+            self.tail_index = 0
+        body[(self.tail_index + self.length) % len(body)] = cell
+        self.length += 1
+
+    def spawn_food(self):
+        cells = self.cells
+        nr_cells = len(cells)
+        for i in range(MAX_FOOD_TRIES):
+            cell = self.get_random(nr_cells)
+            if cells[cell] == EMPTY:
+                break
+        else:
+            free = [cell for cell, value in enumerate(cells) if value == EMPTY]
+            if not free:
+                raise RuntimeError("Congratulations, you broke the game by filling each cell of the board!")
+            cell = free[self.get_random(len(free))]
+        cells[cell] = FOOD
+        self.food.append(cell)
+
+    def get_random(self, n):
+        """
+        :return: A random number from 0 up to n.
+        """
+        self.rng_state = (self.rng_state * RNG_MULTIPLIER + RNG_INCREMENT) & RNG_MASK
+        return (self.rng_state >> 32) % n
+
+    def get_game_object_at(self, x, y):
+        return GAME_OBJECTS[self.cells[x * self.height + y]]
+
+    @property
+    def food_positions(self):
+        """
+        The (x, y) positions of the food blocks.
+        """
+        return [divmod(cell, self.height) for cell in self.food]
+
+    @property
+    def body_parts(self):
+        """
+        The (x, y) positions of the body, from the part directly following the head to the tail (like
+        Snake.body_parts).
+        """
+        body = self.body
+        return [divmod(body[(self.tail_index + i) % len(body)], self.height) for i in range(self.length - 1, -1, -1)]
+
+    def get_copy(self):
+        """
+        :return: A BoardCopy of the cells, which can be given to the state encoders like the board of get_move. It is
+        a real copy: later steps do not change it and changing it does not change the state.
+        """
+        # a view on the live cells, which BoardCopy copies (np.array), so it never escapes
+        cells = np.frombuffer(self.cells, dtype=np.uint8).reshape(self.width, self.height)
+        return BoardCopy(cells, frozenset(self.food_positions), self.wall_positions)
+
+
+def create_state(board, direction, head_position, body_parts, turns_to_starve=-1, max_turns_to_starve=-1,
+                 size=None, grow=False, score=0, turns_alive=0, seed=None):
+    """
+    Creates the state of a game from what get_move is given.
+
+    :param board: The board as given to Agent.get_move (a full copy, not a View).
+
+    :param max_turns_to_starve: The starvation_tics of the game, -1 when the snake does not starve.
+
+    :param size: The number of body parts the snake grows to, by default the length of the body. It is one more
+    in the turn after the snake ate (and grew).
+
+    :param grow: Whether the snake grows when it eats, see Agent.should_grow_on_food_collision.
+
+    :param seed: Seed of the random numbers that place new food, by default a random one.
+    """
+    width, height = board.shape
+    cells = bytearray(np.ascontiguousarray(board, dtype=np.uint8).tobytes())
+    food = [x * height + y for x, y in board.food_positions]
+    body = array('i', [x * height + y for x, y in reversed(list(body_parts))])
+    size = size if size is not None else len(body)
+    seed = seed if seed is not None else random.getrandbits(64)
+    return GameState(width, height, cells, frozenset(board.wall_positions), food, head_position[0], head_position[1],
+                     direction, body, size, grow, score, turns_alive, turns_to_starve, max_turns_to_starve,
+                     seed & RNG_MASK)
+
+
+def get_state(snake, board, seed=None):
+    """
+    Creates the state of the game of a snake, for instance to look ahead from outside of the agent.
+
+    :param seed: Seed of the random numbers that place new food, by default a random one.
+    """
+    return create_state(board.get_copy(), snake.direction, (snake.x, snake.y), snake.body_parts,
+                        snake.tics_to_starve, snake.max_tics_to_starve, snake.size,
+                        snake.agent.should_grow_on_food_collision(), snake.score, snake.tics_alive, seed)
@@ -0,0 +1,204 @@
+"""
+Headless runner for the snake game. It plays the game in a tight loop without creating a window (tkinter is never
+imported), so an agent can be trained as fast as the engine allows, for instance on a server without a display.
+
+It can be used from Python:
+
+    from headless import run
+    result = run(board_width=5, board_height=5, max_episodes=100000)
+
+or from the command line:
+
+    python headless.py --width 5 --height 5 --episodes 100000
+"""
+import argparse
+import random
+import time
+from collections import namedtuple
+
+from board import Board
+from checkpoint import Checkpointer, load_checkpoint, save_checkpoint
+from encoders import AbsoluteStateEncoder
+from frozen import FrozenAgent, load_policy
+from metrics import Metrics
+from replay import ReplayBuffer
+from profiling import Profiler
+from recording import Recorder
+from snake import Snake
+
+RunResult = namedtuple('RunResult', ['tics', 'episodes', 'total_score', 'best_score', 'seconds'])
+
+
+def create_game(board_width, board_height, food_blocks_max, wall_blocks_max, test_config, starvation_tics,
+                seed=None):
+    """
+    Creates a new snake and the board it plays on. The board does not belong to any canvas, so every block is
+    exactly one unit wide and high.
+
+    :param seed: Seed of the random numbers of the game and of the agent, which then draw from two separate
+    random.Random objects. None to use the random module.
+
+    :return: A tuple (snake, board).
+    """
+    rng = random.Random(seed) if seed is not None else None
+    snake = Snake(board_width, board_height, starvation_tics, rng)
+    board = Board(board_width, board_height, board_width, board_height, snake, food_blocks_max, wall_blocks_max,
+                  test_config, rng)
+    if seed is not None:
+        snake.agent.rng = random.Random("{}:agent".format(seed))
+    return snake, board
+
+
+def run(board_width=5, board_height=5, food_blocks_max=1, wall_blocks_max=1, test_config=False, starvation_tics=-1,
+        max_tics=None, max_episodes=None, max_seconds=None, print_scores=False, snake=None, board=None,
+        checkpointer=None):
+    """
+    Plays the game without rendering until one of the given limits is reached. When no limit is given at all, the
+    game is played forever.
+
+    :param board_width, board_height, food_blocks_max, wall_blocks_max, test_config, starvation_tics: The game
+    settings, these have the same meaning as the game settings in main.py.
+
+    :param max_tics: Stop after this many turns (over all episodes), None for no limit.
+
+    :param max_episodes: Stop after this many snakes have died, None for no limit.
+
+    :param max_seconds: Stop after this many seconds of wall-clock time, None for no limit.
+
+    :param print_scores: Whether the score of every episode should be printed to the console.
+
+    :param snake, board: An existing game to continue playing. When not given, a new game is created from the
+    settings.
+
+    :param checkpointer: A checkpoint.Checkpointer that is told about every turn, None to not save checkpoints.
+
+    :return: A RunResult with the number of turns and episodes played, the sum and best of the episode scores and
+    the elapsed time in seconds.
+    """
+    if snake is None or board is None:
+        snake, board = create_game(board_width, board_height, food_blocks_max, wall_blocks_max, test_config,
+                                   starvation_tics)
+
+    tics, episodes, total_score, best_score = 0, 0, 0, 0
+    start = time.perf_counter()
+    deadline = None if max_seconds is None else start + max_seconds
+    while True:
+        if max_tics is not None and tics >= max_tics:
+            break
+        if max_episodes is not None and episodes >= max_episodes:
+            break
+        # only look at the clock every so many turns, reading it costs about as much as a turn of a simple agent
+        if deadline is not None and tics % 256 == 0 and time.perf_counter() >= deadline:
+            break
+
+        died, _ = snake.update(board)
+        tics += 1
+        if checkpointer is not None:
+            checkpointer.tick()
+        if died:
+            episodes += 1
+            total_score += snake.score
+            best_score = max(best_score, snake.score)
+            snake.reset(board, False, not print_scores)
+
+    return RunResult(tics, episodes, total_score, best_score, time.perf_counter() - start)
+
+
+def add_game_arguments(parser):
+    """
+    Adds the game settings as command line arguments to the given argparse parser.
+    """
+    parser.add_argument("--width", type=int, default=5, help="board width")
+    parser.add_argument("--height", type=int, default=5, help="board height")
+    parser.add_argument("--food", type=int, default=1, help="maximum number of food blocks on the board")
+    parser.add_argument("--walls", type=int, default=1, help="maximum number of wall blocks on the board")
+    parser.add_argument("--test-config", action="store_true", help="use the fixed test setup for the walls")
+    parser.add_argument("--starvation", type=int, default=-1, help="number of turns to starve, -1 for disabled")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play the snake game without rendering it.")
+    add_game_arguments(parser)
+    parser.add_argument("--tics", type=int, default=None, help="stop after this many turns")
+    parser.add_argument("--episodes", type=int, default=None, help="stop after this many episodes")
+    parser.add_argument("--seconds", type=float, default=None, help="stop after this many seconds")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random numbers, for reproducible runs")
+    parser.add_argument("--print-scores", action="store_true", help="print the score of every episode")
+    parser.add_argument("--checkpoint-dir", default=None,
+                        help="directory to resume the agent from and to save checkpoints to")
+    parser.add_argument("--checkpoint-every", type=int, default=100000, help="number of turns between checkpoints")
+    parser.add_argument("--profile", action="store_true", help="measure the phases of every turn and report them")
+    parser.add_argument("--capture", type=int, nargs=2, default=None, metavar=("START", "END"),
+                        help="record the turns from START until END with cProfile")
+    parser.add_argument("--capture-prefix", default="profile", help="start of the names of the recording files")
+    parser.add_argument("--trace-memory", action="store_true", help="also record the memory with tracemalloc")
+    parser.add_argument("--report-every", type=float, default=None,
+                        help="print a summary of the training at most once every this many seconds")
+    parser.add_argument("--metrics-dir", default=None, help="directory to append the training metrics to")
+    parser.add_argument("--metrics-window", type=int, default=1000, help="number of episodes per summary")
+    parser.add_argument("--verbose", action="store_true", help="let the agent print every move")
+    parser.add_argument("--record", default=None, help="file to record the moves to, needs --seed (see recording.py)")
+    parser.add_argument("--replay", type=int, default=None, metavar="CAPACITY",
+                        help="learn from minibatches of the last CAPACITY moves instead of from every move once")
+    parser.add_argument("--batch-size", type=int, default=32, help="number of moves per replay minibatch")
+    parser.add_argument("--learn-every", type=int, default=1, help="number of moves between two replay minibatches")
+    parser.add_argument("--policy", default=None,
+                        help="play with a frozen policy (see frozen.py) instead of a learning agent")
+    parser.add_argument("--absolute", action="store_true",
+                        help="the policy belongs to the AbsoluteStateEncoder of a --width x --height board")
+    args = parser.parse_args(argv)
+    if args.record is not None and args.seed is None:
+        parser.error("--record needs --seed")
+    if args.policy is not None and (args.checkpoint_dir is not None or args.replay is not None):
+        parser.error("--policy does not learn, so it can not be combined with --checkpoint-dir or --replay")
+    if args.absolute and args.policy is None:
+        parser.error("--absolute needs --policy")
+    if args.capture is not None and args.capture[1] <= args.capture[0]:
+        parser.error("the END of --capture must be after its START")
+
+    snake, board = create_game(args.width, args.height, args.food, args.walls, args.test_config, args.starvation,
+                               args.seed)
+    if args.record is not None:
+        snake.recorder = Recorder(args.seed, args.width, args.height, args.food, args.walls, args.test_config,
+                                  args.starvation)
+    if args.profile or args.capture is not None:
+        capture_start, capture_end = args.capture if args.capture is not None else (None, None)
+        snake.profiler = Profiler(capture_start=capture_start, capture_end=capture_end,
+                                  capture_prefix=args.capture_prefix, trace_memory=args.trace_memory)
+    if args.policy is not None:
+        state_encoder = AbsoluteStateEncoder(args.width, args.height) if args.absolute else None
+        snake.agent = FrozenAgent(load_policy(args.policy), state_encoder)
+    snake.agent.verbose = args.verbose
+    if args.replay is not None:
+        snake.agent.replay = ReplayBuffer(args.replay, args.batch_size, args.learn_every)
+    metrics = None
+    if args.report_every is not None or args.metrics_dir is not None:
+        metrics = Metrics(args.metrics_window, args.report_every, args.metrics_dir)
+        metrics.attach(snake)
+    checkpointer = None
+    if args.checkpoint_dir is not None:
+        load_checkpoint(snake.agent, args.checkpoint_dir)
+        checkpointer = Checkpointer(snake.agent, args.checkpoint_dir, args.checkpoint_every)
+
+    result = run(max_tics=args.tics, max_episodes=args.episodes, max_seconds=args.seconds,
+                 print_scores=args.print_scores, snake=snake, board=board, checkpointer=checkpointer)
+
+    if snake.profiler is not None:
+        snake.profiler.finish()
+    if checkpointer is not None:
+        checkpointer.wait()
+        save_checkpoint(snake.agent, args.checkpoint_dir)
+    if metrics is not None:
+        metrics.close()
+    if snake.recorder is not None:
+        snake.recorder.save(args.record)
+
+    print("Turns: {}. Episodes: {}. Total score: {}. Best score: {}. Time: {:.2f}s ({:.0f} turns/s)".format(
+        result.tics, result.episodes, result.total_score, result.best_score, result.seconds,
+        result.tics / result.seconds if result.seconds > 0 else 0))
+    if snake.profiler is not None:
+        print(snake.profiler.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
+import random
 from tkinter import *
 from snake import Snake
 from board import Board
+from checkpoint import Checkpointer, load_checkpoint
+from encoders import AbsoluteStateEncoder
+from frozen import FrozenAgent, load_policy
+from profiling import Profiler
+from raster import RasterRenderer
+from simulation import Simulation
+from metrics import Metrics
 
 
 root = None
@@ -10,6 +18,8 @@ canvas_width = 800
 canvas_height = 800
 
 tics_per_second = 1000
+# the board is drawn at most this many times per second, the game itself runs at tics_per_second on its own thread
+frames_per_second = 30
 previous_text_drawn = False
 
 """ BEGIN GAME SETTINGS """
@@ -28,69 +38,141 @@ starvation_tics = -1
 print_score_not_on_non_redraw = True
 """ END GAME SETTINGS """
 
+# Directory to resume the agent from and to save checkpoints to, None to not use checkpoints
+checkpoint_directory = None
+# Number of turns between two checkpoints
+checkpoint_every_tics = 100000
+# Whether the time spent in each phase of a turn should be measured, the results are printed every profile_every_tics
+profile = False
+profile_every_tics = 1000
+# Minimum number of seconds between two training summaries on the console, None for no summaries
+report_every_seconds = 5
+# Directory the training metrics are appended to, None to not save them
+metrics_directory = None
+# Whether the agent should print every move to the console (slow)
+verbose_agent = False
+# Seed of the random numbers of the game and the agent, to play the same games again. None for different games
+seed = None
+# Frozen policy (see frozen.py) to play with instead of the learning agent, None to use the agent
+policy_file = None
+# Whether the policy belongs to the AbsoluteStateEncoder of this board size (frozen.py --absolute) instead of the
+# RelativeStateEncoder
+policy_absolute = False
+# Whether the board is drawn as one image (see raster.py) instead of a rectangle per cell, None to do so only for boards
+# with more than 100x100 cells
+raster_drawing = None
+
 # game objects
 snake = None
 board = None
+# what draws the board: the board itself or a RasterRenderer
+drawer = None
+checkpointer = None
+simulation = None
+render_profiler = None
+speed_label = None
+unlimited = None
 
 
 def callback():
-    update()
+    simulation.step()
 
 
 def main():
-    global root, canvas, canvas_height, canvas_width, board, snake, scale
+    global root, canvas, canvas_height, canvas_width, board, snake, scale, checkpointer, simulation, speed_label, \
+        unlimited, render_profiler, drawer
     root = Tk()
     root.title("Snake")
     canvas = Canvas(root, width=canvas_width, height=canvas_height)
-    scale = Scale(root, from_=0, to=500, orient=HORIZONTAL, length=canvas_width, tickinterval=25,
-                  label="Turns Per Second")
+    scale = Scale(root, from_=0, to=1000, orient=HORIZONTAL, length=canvas_width, tickinterval=100,
+                  label="Turns Per Second", command=on_slider_update)
     scale.set(tics_per_second)
-    scale.bind("<ButtonRelease-1>", on_slider_update)
+    unlimited = BooleanVar(value=False)
     canvas.pack()
-    scale.pack(side=LEFT)
+    scale.pack()
+    speed_label = Label(root, text="")
+    speed_label.pack(side=LEFT)
+    Checkbutton(root, text="Unlimited", variable=unlimited, command=on_slider_update).pack(side=LEFT)
     b = Button(root, text="Next Step", command=callback)
     b.pack()
-    snake = Snake(board_width, board_height, starvation_tics)
+    rng = random.Random(seed) if seed is not None else None
+    snake = Snake(board_width, board_height, starvation_tics, rng)
+    if seed is not None:
+        snake.agent.rng = random.Random("{}:agent".format(seed))
+    if profile:
+        snake.profiler = Profiler()
+        render_profiler = Profiler()
+    if policy_file is not None:
+        state_encoder = AbsoluteStateEncoder(board_width, board_height) if policy_absolute else None
+        snake.agent = FrozenAgent(load_policy(policy_file), state_encoder)
+    snake.agent.verbose = verbose_agent
+    if report_every_seconds is not None or metrics_directory is not None:
+        Metrics(console_interval=report_every_seconds, log_directory=metrics_directory).attach(snake)
     board = Board(board_width, board_height, canvas_width, canvas_height, snake, food_blocks_max, wall_blocks_max,
-                  test_config)
-    board.draw(canvas)
-    canvas.after(int(1000 / tics_per_second), game_loop)
+                  test_config, rng)
+    if checkpoint_directory is not None:
+        load_checkpoint(snake.agent, checkpoint_directory)
+        checkpointer = Checkpointer(snake.agent, checkpoint_directory, checkpoint_every_tics)
+    raster = raster_drawing if raster_drawing is not None else board_width * board_height > 100 * 100
+    drawer = RasterRenderer(board) if raster else board
+    drawer.draw(canvas)
+    simulation = Simulation(snake, board, tics_per_second, False, print_score_not_on_non_redraw, checkpointer,
+                            profile_every_tics)
+    simulation.start()
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    root.after(int(1000 / frames_per_second), render_loop)
+    root.after(500, speed_loop)
     mainloop()
 
 
-def game_loop():
-    global canvas, tics_per_second
-    if tics_per_second > 0:
-        update()
-        canvas.after(int(1000 / tics_per_second), game_loop)
-    else:
-        canvas.after(int(1000), game_loop)
-
-
-def update():
-    global tics_per_second, board, snake, canvas, previous_text_drawn, print_score_not_on_non_redraw
-
-    # update gamestate
-    result = snake.update(board)
-    if result[0]:
-        snake.reset(board, result[1], print_score_not_on_non_redraw)
-
-    if result[1]:
-        # clear canvas
-        canvas.delete("all")
-        # draw new state
-        board.draw(canvas)
-        previous_text_drawn = False
-    elif not previous_text_drawn:
-        previous_text_drawn = True
-        canvas.delete("all")
-        canvas.create_text(canvas_width/2, canvas_height/2, fill="darkblue", font="Times 20 bold", justify="center",
-                           text="Currently not redrawing the board \nStill use slider to determine game speed!!!")
+def render_loop():
+    render()
+    root.after(int(1000 / frames_per_second), render_loop)
+
+
+def render():
+    """
+    Draws the latest state of the game, the simulation thread does not play while the board is drawn.
+    """
+    global previous_text_drawn
+    if render_profiler is not None:
+        render_profiler.start_tick()
+    with simulation.lock:
+        if simulation.redraw_board:
+            if previous_text_drawn:
+                # remove the text, the board is then drawn from scratch
+                canvas.delete("all")
+            # draw new state, only the cells that changed are redrawn
+            drawer.draw(canvas)
+            previous_text_drawn = False
+        elif not previous_text_drawn:
+            previous_text_drawn = True
+            canvas.delete("all")
+            drawer.clear_drawing()
+            canvas.create_text(canvas_width/2, canvas_height/2, fill="darkblue", font="Times 20 bold",
+                               justify="center",
+                               text="Currently not redrawing the board \nStill use slider to determine game speed!!!")
+    if render_profiler is not None:
+        render_profiler.lap("render")
+        if render_profiler.tics % profile_every_tics == 0:
+            print(render_profiler.report())
+
+
+def speed_loop():
+    speed_label.config(text="Measured: {:.0f} turns/s".format(simulation.measure()))
+    root.after(500, speed_loop)
+
+
+def on_slider_update(event=None):
+    global tics_per_second
+    tics_per_second = scale.get()
+    if simulation is not None:
+        simulation.set_speed(tics_per_second, unlimited.get())
 
 
-def on_slider_update(event):
-    global scale, tics_per_second
-    tics_per_second = scale.get()
+def on_close():
+    simulation.stop()
+    root.destroy()
 
 
 if __name__ == "__main__":
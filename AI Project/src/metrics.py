@@ -0,0 +1,218 @@
+"""
+Training metrics. Instead of printing to the console every turn, the agent and the snake report into a Metrics
+object, which keeps sums and last values in memory and hands them to a background thread every window of episodes.
+That thread:
+
+- prints a summary of the latest window to the console, at most once every console_interval seconds,
+- appends every window summary to summary.jsonl (or summary.csv) in the log directory,
+- appends every episode to a columnar log in the log directory: one raw binary file per column (i.e. score.int64),
+  which load_episode_log opens memory-mapped, so queries over millions of episodes are plain NumPy operations:
+
+    log = load_episode_log("metrics")
+    print(log["score"].mean(), log["score"][-10000:].max())
+
+Reporting:
+
+- metrics.add(name, value): sum of a value, per window and per episode (i.e. rewards),
+- metrics.set(name, value): last value of a gauge (i.e. epsilon),
+- metrics.record_episode(score, length): ends an episode.
+"""
+import csv
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_EPISODE_COLUMNS = ("reward", "epsilon")
+
+
+class Metrics:
+
+    def __init__(self, window=1000, console_interval=5.0, log_directory=None, summary_format="jsonl",
+                 episode_columns=DEFAULT_EPISODE_COLUMNS):
+        """
+        :param window: The number of episodes that are summarized together.
+
+        :param console_interval: The minimum number of seconds between two summaries on the console, None to never
+        print.
+
+        :param log_directory: The directory the summaries and episodes are appended to, None to not write files.
+
+        :param summary_format: "jsonl" or "csv", the format of the summary file.
+
+        :param episode_columns: The reported values that are stored per episode next to the score and the length. For
+        a value given to add the sum over the episode is stored, for a value given to set the last value.
+        """
+        if summary_format not in ("jsonl", "csv"):
+            raise ValueError("summary_format must be 'jsonl' or 'csv'")
+        self.window = window
+        self.console_interval = console_interval
+        self.log_directory = log_directory
+        self.summary_format = summary_format
+        self.episode_columns = tuple(episode_columns)
+        if log_directory is not None:
+            os.makedirs(log_directory, exist_ok=True)
+
+        self.total_episodes = 0
+        self.window_start = time.perf_counter()
+        self.window_sums = {}
+        self.window_counts = {}
+        self.episode_sums = {}
+        self.gauges = {}
+        self.episodes = {name: [] for name in ("score", "length") + self.episode_columns}
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def attach(self, snake):
+        """
+        Lets the snake (its episodes) and its agent (rewards, epsilon, ...) report to these metrics.
+        """
+        snake.metrics = self
+        snake.agent.metrics = self
+
+    def add(self, name, value):
+        self.window_sums[name] = self.window_sums.get(name, 0) + value
+        self.window_counts[name] = self.window_counts.get(name, 0) + 1
+        self.episode_sums[name] = self.episode_sums.get(name, 0) + value
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    def record_episode(self, score, length):
+        self.episodes["score"].append(score)
+        self.episodes["length"].append(length)
+        for name in self.episode_columns:
+            if name in self.episode_sums:
+                value = self.episode_sums[name]
+            else:
+                value = self.gauges.get(name, np.nan)
+            self.episodes[name].append(value)
+        self.episode_sums = {}
+        self.total_episodes += 1
+        if len(self.episodes["score"]) >= self.window:
+            self.flush()
+
+    def flush(self):
+        """
+        Hands the current window to the background thread, even when it is not complete.
+        """
+        if len(self.episodes["score"]) == 0:
+            return
+        now = time.perf_counter()
+        scores = np.array(self.episodes["score"])
+        lengths = np.array(self.episodes["length"])
+        summary = {
+            "episodes": self.total_episodes,
+            "window_episodes": len(scores),
+            "episodes_per_second": len(scores) / (now - self.window_start) if now > self.window_start else 0,
+            "score_mean": float(scores.mean()),
+            "score_max": int(scores.max()),
+            "length_mean": float(lengths.mean()),
+        }
+        for name, total in self.window_sums.items():
+            summary[name + "_sum"] = float(total)
+            summary[name + "_mean"] = float(total / self.window_counts[name])
+        for name, value in self.gauges.items():
+            summary[name] = value
+        columns = {"score": scores.astype(np.int64), "length": lengths.astype(np.int64)}
+        for name in self.episode_columns:
+            columns[name] = np.array(self.episodes[name], dtype=np.float64)
+        self.queue.put((summary, columns))
+
+        self.window_start = now
+        self.window_sums = {}
+        self.window_counts = {}
+        self.episodes = {name: [] for name in self.episodes}
+
+    def close(self):
+        """
+        Flushes the last (partial) window and waits until everything is written.
+        """
+        self.flush()
+        self.queue.put(None)
+        self.thread.join()
+
+    def write_loop(self):
+        last_console_time = None
+        pending_console = None
+        csv_fields = None
+        while True:
+            timeout = None
+            if pending_console is not None:
+                timeout = max(0.0, last_console_time + self.console_interval - time.perf_counter())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = False
+
+            if item:
+                summary, columns = item
+                if self.log_directory is not None:
+                    csv_fields = self.write_summary(summary, csv_fields)
+                    for name, values in columns.items():
+                        with open(os.path.join(self.log_directory, "{}.{}".format(name, values.dtype.name)),
+                                  "ab") as file:
+                            values.tofile(file)
+                if self.console_interval is not None:
+                    pending_console = summary
+
+            now = time.perf_counter()
+            if pending_console is not None and (item is None or last_console_time is None or
+                                                now - last_console_time >= self.console_interval):
+                print(format_summary(pending_console))
+                pending_console = None
+                last_console_time = now
+            if item is None:
+                return
+
+    def write_summary(self, summary, csv_fields):
+        if self.summary_format == "jsonl":
+            with open(os.path.join(self.log_directory, "summary.jsonl"), "a") as file:
+                file.write(json.dumps(summary) + "\n")
+            return csv_fields
+        path = os.path.join(self.log_directory, "summary.csv")
+        if csv_fields is None:
+            csv_fields = list(summary.keys())
+            if os.path.exists(path):
+                with open(path, newline="") as file:
+                    csv_fields = next(csv.reader(file), csv_fields)
+        with open(path, "a", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=csv_fields, extrasaction="ignore")
+            if file.tell() == 0:
+                writer.writeheader()
+            writer.writerow(summary)
+        return csv_fields
+
+
+def format_summary(summary):
+    text = "Episodes: {}. Mean score: {:.2f}. Best score: {}. Mean turns: {:.1f}. Episodes/s: {:.0f}".format(
+        summary["episodes"], summary["score_mean"], summary["score_max"], summary["length_mean"],
+        summary["episodes_per_second"])
+    if "epsilon" in summary:
+        text += ". Epsilon: {:.4f}".format(summary["epsilon"])
+    if summary.get("penalties_sum", 0) > 0:
+        text += ". Food per penalty: {:.3f}".format(summary.get("food_sum", 0) / summary["penalties_sum"])
+    return text
+
+
+def load_episode_log(log_directory):
+    """
+    Opens the episode columns in the log directory memory-mapped.
+
+    :return: A dictionary with a NumPy array per column, i.e. log["score"].
+    """
+    log = {}
+    for file_name in os.listdir(log_directory):
+        name, _, dtype = file_name.rpartition(".")
+        if name and name != "summary" and hasattr(np, dtype):
+            path = os.path.join(log_directory, file_name)
+            if os.path.getsize(path) > 0:
+                log[name] = np.memmap(path, dtype=dtype, mode="r")
+            else:
+                log[name] = np.zeros(0, dtype=dtype)
+    return log
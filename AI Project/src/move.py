@@ -1,4 +1,7 @@
 from enum import Enum
+from functools import lru_cache
+
+import numpy as np
 
 
 class Move(Enum):
@@ -22,7 +25,8 @@ class Direction(Enum):
 
         :return: The new direction after making this move.
         """
-        return Direction((self.value + move.value) % 4)
+        # _value_ is the same as value, but reading it skips the (slow) enum property
+        return NEW_DIRECTIONS[self._value_][move._value_ + 1]
 
     def get_xy_manipulation(self):
         """
@@ -37,13 +41,7 @@ class Direction(Enum):
         :return: A tuple with the x and y manipulation when going straight given the direction. The x value is the
         first element and the y value the second element.
         """
-        m = {
-            Direction.NORTH: (0, -1),
-            Direction.EAST: (1, 0),
-            Direction.SOUTH: (0, 1),
-            Direction.WEST: (-1, 0)
-        }
-        return m[self]
+        return XY_MANIPULATIONS[self._value_]
 
     def get_xy_moves(self):
         """
@@ -52,14 +50,56 @@ class Direction(Enum):
 
         :return: A list containing all available x y manipulations given the direction.
         """
-        m = {
-            Direction.NORTH: [Direction.NORTH.get_xy_manipulation(), Direction.EAST.get_xy_manipulation(),
-                              Direction.WEST.get_xy_manipulation()],
-            Direction.EAST: [Direction.NORTH.get_xy_manipulation(), Direction.EAST.get_xy_manipulation(),
-                             Direction.SOUTH.get_xy_manipulation()],
-            Direction.SOUTH: [Direction.SOUTH.get_xy_manipulation(), Direction.EAST.get_xy_manipulation(),
-                              Direction.WEST.get_xy_manipulation()],
-            Direction.WEST: [Direction.NORTH.get_xy_manipulation(), Direction.WEST.get_xy_manipulation(),
-                             Direction.SOUTH.get_xy_manipulation()],
-        }
-        return m[self]
+        return list(XY_MOVES[self._value_])
+
+
+# Precomputed transition tables. Directions and moves are indexed by number: direction.value (0 to 3) and
+# move.value + 1 (0 for left, 1 for straight, 2 for right).
+
+# new direction (as Direction) for each direction and move
+NEW_DIRECTIONS = tuple(tuple(Direction((direction + move) % 4) for move in (-1, 0, 1)) for direction in range(4))
+
+# x and y manipulation for each direction
+XY_MANIPULATIONS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+# result of get_xy_moves for each direction
+XY_MOVES = (
+    (XY_MANIPULATIONS[0], XY_MANIPULATIONS[1], XY_MANIPULATIONS[3]),
+    (XY_MANIPULATIONS[0], XY_MANIPULATIONS[1], XY_MANIPULATIONS[2]),
+    (XY_MANIPULATIONS[2], XY_MANIPULATIONS[1], XY_MANIPULATIONS[3]),
+    (XY_MANIPULATIONS[0], XY_MANIPULATIONS[3], XY_MANIPULATIONS[2]),
+)
+
+# the same tables as arrays, to be indexed with (arrays of) numbers: NEW_DIRECTION_TABLE[direction, move + 1] is
+# the new direction value, DX_TABLE[direction] and DY_TABLE[direction] the x and y manipulation
+NEW_DIRECTION_TABLE = np.array([[direction.value for direction in row] for row in NEW_DIRECTIONS], dtype=np.int8)
+DX_TABLE = np.array([dx for dx, dy in XY_MANIPULATIONS], dtype=np.int8)
+DY_TABLE = np.array([dy for dx, dy in XY_MANIPULATIONS], dtype=np.int8)
+for table in (NEW_DIRECTION_TABLE, DX_TABLE, DY_TABLE):
+    table.flags.writeable = False
+
+# next cell value for moves that leave the board
+OFF_BOARD = -1
+
+
+@lru_cache(maxsize=None)
+def get_next_cell_table(board_width, board_height):
+    """
+    Used to look up where a move leads on a board of the given size. The cells of the board are numbered: cell (x, y)
+    has number x * board_height + y.
+
+    Example: the snake is at (x, y) facing direction and makes move. The number of the cell it moves into is
+    table[x * board_height + y, direction.value, move.value + 1], which is OFF_BOARD when it leaves the board.
+
+    :return: A read-only int32 array of shape (board_width * board_height, 4, 3). The table is made once per board
+    size.
+    """
+    x = np.arange(board_width).repeat(board_height)[:, None, None]
+    y = np.tile(np.arange(board_height), board_width)[:, None, None]
+    new_directions = NEW_DIRECTION_TABLE[None, :, :]
+    new_x = x + DX_TABLE[new_directions]
+    new_y = y + DY_TABLE[new_directions]
+    inside = (new_x >= 0) & (new_x < board_width) & (new_y >= 0) & (new_y < board_height)
+    table = np.where(inside, new_x * board_height + new_y, OFF_BOARD).astype(np.int32)
+    table.flags.writeable = False
+    return table
@@ -0,0 +1,230 @@
+"""
+Trains one Q-table with several processes at once. Every worker process plays its own headless game with its own
+seeded random numbers, while the Q-table lives in shared memory (multiprocessing.shared_memory, Python 3.8 or newer).
+There are two ways of sharing the table:
+
+- hogwild: all workers read and update the same table, without any locking. Updates of different states never
+  conflict and the few that do are simply lost, which hardly matters for learning.
+- average: every worker learns in its own copy of the table. Every sync_every turns the workers wait for each other
+  and continue with the average of all copies.
+
+The result is a normal NumPy array, which can be saved with np.save and given to Agent(q_table=...). From Python:
+
+    from parallel import train
+    result = train(nr_workers=8, tics_per_worker=1000000, board_width=10, board_height=10)
+
+or from the command line:
+
+    python parallel.py --workers 8 --tics 1000000 --width 10 --height 10 --output q_table.npy
+"""
+import argparse
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+import traceback
+from collections import namedtuple
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from agent import Agent
+from encoders import RelativeStateEncoder
+from headless import add_game_arguments, create_game, run
+
+HOGWILD = 'hogwild'
+AVERAGE = 'average'
+
+TrainResult = namedtuple('TrainResult', ['q_table', 'tics', 'episodes', 'total_score', 'best_score', 'seconds'])
+
+
+def train(nr_workers, tics_per_worker, mode=HOGWILD, sync_every=10000, state_encoder=None, q_table=None, seed=None,
+          board_width=5, board_height=5, food_blocks_max=1, wall_blocks_max=1, test_config=False,
+          starvation_tics=-1):
+    """
+    Trains a Q-table with the given number of worker processes.
+
+    :param nr_workers: The number of worker processes, normally the number of cores.
+
+    :param tics_per_worker: The number of turns every worker plays.
+
+    :param mode: HOGWILD to let all workers update one table, AVERAGE to average the tables of the workers every
+    sync_every turns.
+
+    :param sync_every: The number of turns between two averages, only used in AVERAGE mode.
+
+    :param state_encoder: The state encoder of the agents, by default the RelativeStateEncoder. It must give a dense
+    Q-table.
+
+    :param q_table: The Q-table to start from, by default an empty table.
+
+    :param seed: Seed of the random numbers, worker i uses its own stream derived from (seed, i). None for random.
+
+    :param board_width, board_height, food_blocks_max, wall_blocks_max, test_config, starvation_tics: The game
+    settings, these have the same meaning as the game settings in main.py.
+
+    :return: A TrainResult with the trained Q-table and the turns, episodes and scores of all workers together.
+    """
+    if mode not in (HOGWILD, AVERAGE):
+        raise ValueError("mode must be '{}' or '{}'".format(HOGWILD, AVERAGE))
+    if state_encoder is None:
+        state_encoder = RelativeStateEncoder()
+    if q_table is None:
+        q_table = state_encoder.create_q_table()
+    if not isinstance(q_table, np.ndarray):
+        raise ValueError("only dense Q-tables can be shared between processes")
+
+    # hogwild needs one shared table, averaging one table with the average followed by one table per worker
+    nr_tables = 1 if mode == HOGWILD else nr_workers + 1
+    shape = (nr_tables,) + q_table.shape
+    memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * q_table.itemsize)
+    try:
+        tables = np.ndarray(shape, dtype=q_table.dtype, buffer=memory.buf)
+        tables[:] = q_table
+
+        game_settings = (board_width, board_height, food_blocks_max, wall_blocks_max, test_config, starvation_tics)
+        barrier = multiprocessing.Barrier(nr_workers)
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=run_worker,
+                                           args=(worker, memory.name, shape, q_table.dtype.str, mode, sync_every,
+                                                 tics_per_worker, state_encoder, seed, game_settings, barrier,
+                                                 results))
+                   for worker in range(nr_workers)]
+        start = time.perf_counter()
+        for process in workers:
+            process.start()
+        try:
+            worker_results = collect_results(workers, results, barrier)
+        finally:
+            for process in workers:
+                process.join()
+        seconds = time.perf_counter() - start
+
+        trained = tables[0].copy()
+        del tables
+    finally:
+        memory.close()
+        memory.unlink()
+
+    return TrainResult(trained, sum(r.tics for r in worker_results), sum(r.episodes for r in worker_results),
+                       sum(r.total_score for r in worker_results), max(r.best_score for r in worker_results),
+                       seconds)
+
+
+def collect_results(workers, results, barrier):
+    """
+    Waits for the TrainResult of every worker.
+
+    :raise RuntimeError: When a worker failed, with the error of the worker. The other workers are then stopped.
+    """
+    worker_results = []
+    nr_reported = 0
+    error = None
+    while nr_reported < len(workers) and error is None:
+        try:
+            worker, result, error = results.get(timeout=0.1)
+        except queue.Empty:
+            # a worker that exits without reporting was killed, i.e. because it ran out of memory
+            for worker, process in enumerate(workers):
+                if process.exitcode is not None and process.exitcode != 0:
+                    error = "exited with code {}".format(process.exitcode)
+                    break
+            continue
+        nr_reported += 1
+        if result is not None:
+            worker_results.append(result)
+    if error is not None:
+        # the other workers would wait for the failed one forever in average mode
+        barrier.abort()
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+        raise RuntimeError("worker {} failed: {}".format(worker, error))
+    return worker_results
+
+
+def run_worker(worker, memory_name, shape, dtype, mode, sync_every, tics, state_encoder, seed, game_settings,
+               barrier, results):
+    """
+    Body of a worker process, see train. Puts a tuple (worker, result, error) on the results queue: the TrainResult
+    and None, None and the traceback when the worker failed, or twice None when it stopped because another worker
+    failed.
+    """
+    try:
+        result = train_worker(worker, memory_name, shape, dtype, mode, sync_every, tics, state_encoder, seed,
+                              game_settings, barrier)
+    except threading.BrokenBarrierError:
+        results.put((worker, None, None))
+    except BaseException:
+        # wakes up the workers waiting for this one at the barrier
+        barrier.abort()
+        results.put((worker, None, traceback.format_exc()))
+    else:
+        results.put((worker, result, None))
+
+
+def train_worker(worker, memory_name, shape, dtype, mode, sync_every, tics, state_encoder, seed, game_settings,
+                 barrier):
+    memory = shared_memory.SharedMemory(name=memory_name)
+    tables = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+
+    # every worker plays its own game with its own random numbers, a forked worker would otherwise continue the
+    # random module of the parent just like all other workers
+    worker_seed = "{}:{}".format(seed, worker) if seed is not None else random.SystemRandom().getrandbits(64)
+    snake, board = create_game(*game_settings, seed=worker_seed)
+    rng = snake.agent.rng
+    if mode == HOGWILD:
+        snake.agent = Agent(state_encoder, tables[0], rng=rng)
+        rounds = [tics]
+    else:
+        snake.agent = Agent(state_encoder, tables[0].copy(), rng=rng)
+        rounds = [sync_every] * (tics // sync_every) + ([tics % sync_every] if tics % sync_every > 0 else [])
+
+    done_tics, episodes, total_score, best_score = 0, 0, 0, 0
+    for round_tics in rounds:
+        result = run(snake=snake, board=board, max_tics=round_tics)
+        done_tics += result.tics
+        episodes += result.episodes
+        total_score += result.total_score
+        best_score = max(best_score, result.best_score)
+
+        if mode == AVERAGE:
+            tables[worker + 1] = snake.agent.q_table
+            if barrier.wait() == 0:
+                tables[0] = tables[1:].mean(axis=0)
+            barrier.wait()
+            snake.agent.q_table[:] = tables[0]
+
+    del tables, snake
+    memory.close()
+    return TrainResult(None, done_tics, episodes, total_score, best_score, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train one Q-table with several processes.")
+    add_game_arguments(parser)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--tics", type=int, required=True, help="number of turns per worker")
+    parser.add_argument("--mode", choices=[HOGWILD, AVERAGE], default=HOGWILD, help="how the table is shared")
+    parser.add_argument("--sync-every", type=int, default=10000, help="turns between averages in average mode")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random numbers")
+    parser.add_argument("--input", default=None, help="Q-table (.npy) to continue training")
+    parser.add_argument("--output", default=None, help="file (.npy) to save the trained Q-table to")
+    args = parser.parse_args(argv)
+
+    q_table = np.load(args.input) if args.input is not None else None
+    result = train(args.workers, args.tics, args.mode, args.sync_every, q_table=q_table, seed=args.seed,
+                   board_width=args.width, board_height=args.height, food_blocks_max=args.food,
+                   wall_blocks_max=args.walls, test_config=args.test_config, starvation_tics=args.starvation)
+    if args.output is not None:
+        np.save(args.output, result.q_table)
+
+    print("Turns: {}. Episodes: {}. Total score: {}. Best score: {}. Time: {:.2f}s ({:.0f} episodes/s)".format(
+        result.tics, result.episodes, result.total_score, result.best_score, result.seconds,
+        result.episodes / result.seconds if result.seconds > 0 else 0))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Offline planner for small boards. Instead of learning the Q-table by playing, it computes the best Q-values directly
+from the rules of the game with value iteration. This works for the AbsoluteStateEncoder (head position, direction and
+food position) when the snake does not grow or starve and there is one food block: the state then says everything
+about the game, apart from where the next food block spawns, which is uniformly random over the free cells.
+
+The walls are part of the rules, so a table only fits the board it was made for. The easiest way to get the same
+board again is a seed:
+
+    python planner.py --width 5 --height 5 --walls 1 --seed 1 --output q_table.npy
+
+after which the table can be given to the agent of a game with the same settings and seed:
+
+    Agent(state_encoder=AbsoluteStateEncoder(5, 5), q_table=np.load("q_table.npy"))
+
+The rewards and the discount are those of Agent (see Agent.reward and Agent.gamma).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from agent import Agent
+from encoders import AbsoluteStateEncoder
+from gameobjects import GameObject
+from headless import add_game_arguments, create_game, run
+from move import DX_TABLE, DY_TABLE, NEW_DIRECTION_TABLE
+
+
+def get_rewards():
+    """
+    :return: A tuple (reward for dying, reward for eating, reward for any other move) of Agent. Leaving the board is
+    rewarded like running into a wall.
+    """
+    # reward counts penalties, so it is asked on a new agent
+    agent = Agent()
+    return agent.reward(GameObject.WALL), agent.reward(GameObject.FOOD), agent.reward(GameObject.EMPTY)
+
+
+def solve(board_width, board_height, wall_positions, gamma=None, rewards=None, tolerance=1e-4,
+          max_iterations=10000):
+    """
+    Computes the best Q-values with value iteration. Every iteration updates all states at once:
+
+        Q(s, a) = reward(s, a) + gamma * E[max over a' of Q(s', a')]
+
+    where s' is the state after the move and the expectation is over the spawn position of the next food block.
+
+    :param wall_positions: The (x, y) positions of the walls.
+
+    :param gamma: The discount, by default the one of Agent.
+
+    :param rewards: A tuple (die, food, move) of rewards, by default those of Agent (see get_rewards).
+
+    :param tolerance: Stop when no Q-value changes more than this in an iteration.
+
+    :return: A tuple (q_table, iterations). The table is a float32 array of shape (nr_states, 3) indexed like the
+    table of AbsoluteStateEncoder(board_width, board_height). States that can not occur (the head or the food on a
+    wall, the food on the head) have all values zero.
+    """
+    width, height = board_width, board_height
+    gamma = gamma if gamma is not None else Agent().gamma
+    reward_die, reward_food, reward_move = rewards if rewards is not None else get_rewards()
+
+    walls = np.zeros((width, height), dtype=bool)
+    for x, y in wall_positions:
+        walls[x, y] = True
+    free = ~walls
+    nr_free = int(free.sum())
+
+    # where every move of every head position and direction leads, as arrays of shape (x, y, direction, move)
+    x = np.arange(width)[:, None, None, None]
+    y = np.arange(height)[None, :, None, None]
+    new_directions = np.broadcast_to(NEW_DIRECTION_TABLE[None, None, :, :], (width, height, 4, 3)).astype(np.int64)
+    new_x = x + DX_TABLE[new_directions]
+    new_y = y + DY_TABLE[new_directions]
+    inside = (new_x >= 0) & (new_x < width) & (new_y >= 0) & (new_y < height)
+    new_x = np.where(inside, new_x, 0)
+    new_y = np.where(inside, new_y, 0)
+    dies = ~inside | walls[new_x, new_y]
+
+    # whether the move eats the food, shape (x, y, direction, move, food x, food y)
+    food_x = np.arange(width)[:, None]
+    food_y = np.arange(height)[None, :]
+    eats = (new_x[..., None, None] == food_x) & (new_y[..., None, None] == food_y) & ~dies[..., None, None]
+
+    # the states that can occur: head and food on free cells, not on top of each other
+    on_head = (np.arange(width)[:, None, None, None, None] == np.arange(width)[None, None, None, :, None]) & \
+              (np.arange(height)[None, :, None, None, None] == np.arange(height)[None, None, None, None, :])
+    valid = free[:, :, None, None, None] & free[None, None, None, :, :] & ~on_head
+
+    q = np.zeros((width, height, 4, 3, width, height))
+    all_x, all_y = np.meshgrid(np.arange(width), np.arange(height), indexing="ij")
+    for iteration in range(1, max_iterations + 1):
+        values = np.where(valid, q.max(axis=3), 0)
+        # value after a move that does not eat: the food stays where it is
+        moved = values[new_x, new_y, new_directions]
+        # value after eating at (x, y) facing direction: the average over the free cells where the food can spawn
+        spawned = (values * free).sum(axis=(3, 4)) - values[all_x, all_y, :, all_x, all_y]
+        spawned /= max(nr_free - 1, 1)
+        ate = spawned[new_x, new_y, new_directions]
+
+        new_q = np.where(eats, reward_food + gamma * ate[..., None, None], reward_move + gamma * moved)
+        new_q = np.where(dies[..., None, None], reward_die, new_q)
+        change = np.abs(new_q - q).max()
+        q = new_q
+        if change <= tolerance:
+            break
+
+    q = np.where(valid[:, :, :, None], q, 0)
+    return q.transpose(0, 1, 2, 4, 5, 3).reshape(-1, 3).astype(np.float32), iteration
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute the Q-table of a small board with value iteration.")
+    add_game_arguments(parser)
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed of the game, the walls are placed like in a game with this seed")
+    parser.add_argument("--gamma", type=float, default=None, help="discount, by default the one of the agent")
+    parser.add_argument("--output", default=None, help=".npy file to save the Q-table to")
+    parser.add_argument("--play", type=int, default=0, metavar="TICS",
+                        help="play this many turns with the table and with an agent that starts empty, to compare")
+    args = parser.parse_args(argv)
+    if args.food != 1:
+        parser.error("the planner only supports one food block")
+    if args.starvation != -1:
+        parser.error("the planner does not support starvation, --starvation must be -1")
+    game_settings = (args.width, args.height, args.food, args.walls, args.test_config, args.starvation)
+
+    snake, board = create_game(*game_settings, seed=args.seed)
+    if snake.agent.should_grow_on_food_collision():
+        parser.error("the planner only supports snakes that do not grow, but Agent.should_grow_on_food_collision "
+                     "returns True")
+    start = time.perf_counter()
+    q_table, iterations = solve(args.width, args.height, board.wall_positions, args.gamma)
+    print("Solved {} states in {} iterations and {:.2f}s".format(len(q_table), iterations,
+                                                                 time.perf_counter() - start))
+    if args.output is not None:
+        np.save(args.output, q_table)
+
+    if args.play > 0:
+        for name, table in (("planned table", q_table), ("empty table", None)):
+            snake, board = create_game(*game_settings, seed=args.seed)
+            snake.agent = Agent(AbsoluteStateEncoder(args.width, args.height), table)
+            result = run(max_tics=args.play, snake=snake, board=board)
+            print("{}: {} turns, {} episodes, total score {}, best score {}".format(
+                name, result.tics, result.episodes, result.total_score, result.best_score))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Instrumentation of the game loop. A Profiler measures how long each phase of a turn takes (the board copy, the
+agent, moving, collision checks, food, rendering, ...). It is switched on by giving the snake a profiler:
+
+    snake.profiler = Profiler()
+    (play)
+    print(snake.profiler.report())
+
+When the snake has no profiler (the default) the game only pays for a few "is None" checks per turn.
+
+A profiler can also record a window of turns with cProfile and/or tracemalloc. The results are written as collapsed
+stacks ("frame;frame;frame value" per line), which flamegraph.pl, speedscope and similar tools can show directly:
+
+    snake.profiler = Profiler(capture_start=1000, capture_end=2000, capture_prefix="profile", trace_memory=True)
+    (play)
+    snake.profiler.finish()
+"""
+import cProfile
+import pstats
+import time
+import tracemalloc
+from collections import deque, OrderedDict
+
+import numpy as np
+
+
+class Profiler:
+
+    def __init__(self, window=10000, capture_start=None, capture_end=None, capture_prefix="profile",
+                 use_cprofile=True, trace_memory=False):
+        """
+        :param window: The number of most recent durations per phase that are kept for the latency percentiles.
+
+        :param capture_start, capture_end: The turns (counted from 1) from which and until which cProfile and/or
+        tracemalloc record, None to not record at all. capture_end must be after capture_start.
+
+        :param capture_prefix: Start of the names of the files the recordings are written to: <prefix>.prof (cProfile
+        statistics), <prefix>.cpu.folded and <prefix>.memory.folded (collapsed stacks).
+
+        :param use_cprofile: Whether cProfile records the window.
+
+        :param trace_memory: Whether tracemalloc records the window.
+        """
+        if capture_start is not None and capture_end <= capture_start:
+            raise ValueError("capture_end must be after capture_start")
+        self.window = window
+        self.totals = OrderedDict()
+        self.calls = OrderedDict()
+        self.durations = OrderedDict()
+        self.counters = OrderedDict()
+        self.tics = 0
+        self.last = time.perf_counter()
+        self.capture_start = capture_start
+        self.capture_end = capture_end
+        self.capture_prefix = capture_prefix
+        self.use_cprofile = use_cprofile
+        self.trace_memory = trace_memory
+        self.cprofile = None
+
+    def start_tick(self):
+        """
+        Called at the start of every turn. Time between turns (i.e. waiting for the next Tk callback) is not measured.
+        """
+        self.tics += 1
+        if self.capture_start is not None:
+            if self.tics == self.capture_start:
+                self.start_capture()
+            elif self.tics == self.capture_end:
+                self.stop_capture()
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        """
+        Adds the time since the start of the turn or the previous lap to the given phase.
+        """
+        now = time.perf_counter()
+        duration = now - self.last
+        self.last = now
+        if phase not in self.totals:
+            self.totals[phase] = 0.0
+            self.calls[phase] = 0
+            self.durations[phase] = deque(maxlen=self.window)
+        self.totals[phase] += duration
+        self.calls[phase] += 1
+        self.durations[phase].append(duration)
+
+    def count(self, name, amount=1):
+        """
+        Increases a counter, for events that are not timed.
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def get_percentiles(self, phase, percentiles=(50, 90, 99)):
+        """
+        :return: The given percentiles (in seconds) of the recent durations of the phase.
+        """
+        return np.percentile(np.array(self.durations[phase]), percentiles)
+
+    def get_histogram(self, phase):
+        """
+        :return: A tuple (counts, edges) of the recent durations of the phase, in buckets that double in size from 1
+        microsecond on. edges are in seconds.
+        """
+        durations = np.array(self.durations[phase])
+        top = max(1, int(np.ceil(np.log2(max(durations.max(), 1e-6) / 1e-6))))
+        edges = np.concatenate([[0], 1e-6 * 2.0 ** np.arange(top + 1)])
+        counts, edges = np.histogram(durations, bins=edges)
+        return counts, edges
+
+    def report(self):
+        """
+        :return: A table with the number of calls, the share of the total time, the mean and the recent percentiles
+        of every phase, followed by the counters.
+        """
+        total = sum(self.totals.values())
+        lines = ["{:<16} {:>10} {:>7} {:>10} {:>10} {:>10} {:>10}".format(
+            "phase", "calls", "share", "mean us", "p50 us", "p90 us", "p99 us")]
+        for phase, phase_total in self.totals.items():
+            p50, p90, p99 = self.get_percentiles(phase) * 1e6
+            lines.append("{:<16} {:>10} {:>6.1%} {:>10.1f} {:>10.1f} {:>10.1f} {:>10.1f}".format(
+                phase, self.calls[phase], phase_total / total if total > 0 else 0,
+                phase_total / self.calls[phase] * 1e6, p50, p90, p99))
+        lines.append("turns: {}, measured time: {:.3f}s".format(self.tics, total))
+        for name, value in self.counters.items():
+            lines.append("{}: {}".format(name, value))
+        return "\n".join(lines)
+
+    def start_capture(self):
+        if self.trace_memory:
+            tracemalloc.start(25)
+        if self.use_cprofile:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    def finish(self):
+        """
+        Call this at the end of a run. When the run ended during the capture window, the recording is stopped and
+        written as if the window ended here.
+        """
+        if self.capture_start is not None and self.capture_start <= self.tics < self.capture_end:
+            self.stop_capture()
+
+    def stop_capture(self):
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.capture_prefix + ".prof")
+            write_collapsed_cprofile(self.cprofile, self.capture_prefix + ".cpu.folded")
+            self.cprofile = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            write_collapsed_tracemalloc(tracemalloc.take_snapshot(), self.capture_prefix + ".memory.folded")
+            tracemalloc.stop()
+
+
+def get_frame_name(function):
+    file_name, line, name = function
+    return "{}:{}:{}".format(file_name.replace("\\", "/").split("/")[-1], line, name)
+
+
+def write_collapsed_cprofile(profile, path, max_depth=64):
+    """
+    Writes cProfile statistics as collapsed stacks with the own time of each function in microseconds. cProfile only
+    knows callers one level up, so the stacks are rebuilt from the call graph: the own time of a function is shared
+    between its callers in proportion to the time spent on behalf of each caller.
+    """
+    stats = pstats.Stats(profile).stats
+    callees = {}
+    for function, (primitive_calls, calls, own_time, cumulative_time, callers) in stats.items():
+        for caller, caller_stats in callers.items():
+            callees.setdefault(caller, []).append((function, caller_stats[3]))
+
+    lines = {}
+
+    def visit(function, stack, share):
+        own_time, cumulative_time = stats[function][2], stats[function][3]
+        stack = stack + [get_frame_name(function)]
+        if own_time * share > 0:
+            key = ";".join(stack)
+            lines[key] = lines.get(key, 0) + own_time * share
+        if len(stack) >= max_depth or cumulative_time <= 0:
+            return
+        for callee, edge_time in callees.get(function, []):
+            # paths worth less than a microsecond are left out, which also keeps the number of paths bounded
+            if get_frame_name(callee) not in stack and share * edge_time >= 1e-6:
+                visit(callee, stack, share * edge_time / stats[callee][3])
+
+    roots = [function for function, function_stats in stats.items() if len(function_stats[4]) == 0]
+    for root in roots:
+        visit(root, [], 1.0)
+
+    with open(path, "w") as file:
+        for stack, seconds in sorted(lines.items()):
+            microseconds = int(round(seconds * 1e6))
+            if microseconds > 0:
+                file.write("{} {}\n".format(stack, microseconds))
+
+
+def write_collapsed_tracemalloc(snapshot, path):
+    """
+    Writes the memory that is still allocated at the end of the window as collapsed stacks, in bytes per stack.
+    """
+    with open(path, "w") as file:
+        for statistic in snapshot.statistics("traceback"):
+            frames = ["{}:{}".format(frame.filename.replace("\\", "/").split("/")[-1], frame.lineno)
+                      for frame in statistic.traceback]
+            file.write("{} {}\n".format(";".join(frames), statistic.size))
@@ -0,0 +1,82 @@
+"""
+Draws the board as one image instead of one canvas rectangle per cell. Every frame the cells of the board are turned
+into the pixels of the canvas at once with NumPy: the GameObject value of the cell under every pixel is looked up and
+turned into a color with a palette. The pixels are handed to a single tkinter PhotoImage, so the number of canvas items
+no longer grows with the board and even 1000x1000 boards can be watched while they are played.
+
+The RasterRenderer can be used instead of the board in drawing code:
+
+    renderer = RasterRenderer(board)
+    renderer.draw(canvas)
+
+Boards smaller than the canvas are scaled up, boards larger than the canvas are scaled down (showing every so many
+cells). Only the Tk that comes with Python is needed.
+"""
+from tkinter import NW, PhotoImage
+
+import numpy as np
+
+from gameobjects import GAME_OBJECT_COLORS
+
+
+def get_palette():
+    """
+    :return: A (256, 3) uint8 array with the RGB color of every GameObject value, white for the other values.
+    """
+    palette = np.full((256, 3), 255, dtype=np.uint8)
+    for game_object, color in GAME_OBJECT_COLORS.items():
+        palette[game_object.value] = [int(color[i:i + 2], 16) for i in (1, 3, 5)]
+    return palette
+
+
+class RasterRenderer:
+
+    def __init__(self, board, image_width=None, image_height=None):
+        """
+        :param image_width, image_height: The size of the image in pixels, by default the size of the canvas the
+        board was made for.
+        """
+        self.board = board
+        self.image_width = image_width if image_width is not None else int(round(board.width * board.block_width))
+        self.image_height = image_height if image_height is not None else \
+            int(round(board.height * board.block_height))
+        self.palette = get_palette()
+        # the cell under every column and every row of pixels
+        self.pixel_x = np.arange(self.image_width) * board.width // self.image_width
+        self.pixel_y = np.arange(self.image_height) * board.height // self.image_height
+        self.header = "P6 {} {} 255\n".format(self.image_width, self.image_height).encode()
+        self.canvas = None
+        self.image = None
+        self.image_item = None
+
+    def get_pixels(self):
+        """
+        :return: The image as an (image_height, image_width, 3) uint8 RGB array.
+        """
+        cells = self.board.get_cells()
+        # picking the rows and columns one axis at a time is much faster than one fancy index over both, the image is
+        # indexed by (row, column) = (y, x)
+        codes = cells.take(self.pixel_x, axis=0).take(self.pixel_y, axis=1).T
+        return self.palette.take(codes, axis=0)
+
+    def clear_drawing(self):
+        """
+        Forgets the image. Call this after removing it from the canvas (i.e. by canvas.delete("all")), the next draw
+        will then create it again.
+        """
+        self.image_item = None
+
+    def draw(self, canvas):
+        """
+        Draws the board, only when a cell changed since the previous draw.
+        """
+        board = self.board
+        if self.image_item is None or self.canvas is not canvas:
+            self.canvas = canvas
+            self.image = PhotoImage(master=canvas, width=self.image_width, height=self.image_height)
+            self.image_item = canvas.create_image(0, 0, image=self.image, anchor=NW)
+        elif len(board.dirty_cells) == 0:
+            return
+        # a binary PPM image, which Tk reads without any other package
+        self.image.configure(data=self.header + self.get_pixels().tobytes(), format="PPM")
+        board.dirty_cells.clear()
@@ -0,0 +1,387 @@
+"""
+Recordings of seeded games. When the snake and the board draw their random numbers from the same seeded
+random.Random, a game is completely determined by the seed, the game settings and the moves of the agent. A recording
+therefore only stores those: every move takes 2 bits, so a million turns fit in 250 kB. Next to that it stores the
+score and the number of turns of every finished episode, to check replays against.
+
+Recording, from the command line:
+
+    python headless.py --seed 1 --tics 1000000 --record game.rec
+
+Replaying, without calling the agent:
+
+    python recording.py game.rec            (fast replay, see simulate)
+    python recording.py game.rec --engine   (also replay with Snake and Board, see replay_with_engine)
+
+Both exit with status 1 when the replay does not end in the recorded scores and numbers of turns, which makes
+recordings useful to check that a change of the engine does not change the outcome of any game.
+"""
+import argparse
+import random
+import struct
+import sys
+import time
+from collections import deque, namedtuple
+
+import numpy as np
+
+from board import Board
+from gameobjects import GameObject
+from move import Move, NEW_DIRECTION_TABLE, OFF_BOARD, get_next_cell_table
+from snake import Snake
+
+MAGIC = b"SNAKEREC"
+VERSION = 1
+# magic, version, width, height, food, walls, test config, grow (2 when unknown), starvation, seed, number of moves
+# and episodes
+HEADER = struct.Struct("<8sHHHHIBBiqQQ")
+
+# move codes: move.value + 1 for the moves, DIED for a turn without a move (the snake starved or the agent did not
+# return a valid move)
+DIED = 3
+
+Recording = namedtuple('Recording', ['board_width', 'board_height', 'food_blocks_max', 'wall_blocks_max',
+                                     'test_config', 'starvation_tics', 'seed', 'grow', 'moves', 'scores', 'lengths'])
+
+
+class Recorder:
+    """
+    Records the moves of a snake. Give the snake a recorder and it reports every turn and episode to it:
+
+        snake.recorder = Recorder(seed, board_width, ...)
+    """
+
+    def __init__(self, seed, board_width, board_height, food_blocks_max, wall_blocks_max, test_config,
+                 starvation_tics):
+        """
+        :param seed: The integer seed of the random.Random shared by the snake and the board of the game.
+
+        :param board_width, board_height, food_blocks_max, wall_blocks_max, test_config, starvation_tics: The game
+        settings, these have the same meaning as the game settings in main.py.
+        """
+        self.seed = seed
+        self.settings = (board_width, board_height, food_blocks_max, wall_blocks_max, test_config, starvation_tics)
+        self.grow = None
+        self.packed = bytearray()
+        self.current = 0
+        self.shift = 0
+        self.nr_moves = 0
+        self.scores = []
+        self.lengths = []
+
+    def record_move(self, move):
+        """
+        :param move: The move of the turn, None (or anything else that is not a Move) when the snake died without
+        moving.
+        """
+        if move == Move.LEFT or move == Move.STRAIGHT or move == Move.RIGHT:
+            code = move.value + 1
+        else:
+            code = DIED
+        self.current |= code << self.shift
+        self.shift += 2
+        if self.shift == 8:
+            self.packed.append(self.current)
+            self.current = 0
+            self.shift = 0
+        self.nr_moves += 1
+
+    def record_grow(self, should_grow):
+        if self.grow is None:
+            self.grow = should_grow
+        elif self.grow != should_grow:
+            raise RuntimeError("a game can only be recorded when should_grow_on_food_collision() always returns the "
+                               "same value")
+
+    def record_episode(self, score, length):
+        self.scores.append(score)
+        self.lengths.append(length)
+
+    def get_recording(self):
+        packed = bytes(self.packed) + (bytes([self.current]) if self.shift > 0 else b"")
+        return Recording(*self.settings, self.seed, self.grow, unpack_moves(packed, self.nr_moves),
+                         np.array(self.scores, dtype=np.int64), np.array(self.lengths, dtype=np.int64))
+
+    def save(self, path):
+        save_recording(self.get_recording(), path)
+
+
+def pack_moves(moves):
+    """
+    :return: The move codes packed in bytes, 4 per byte starting at the lowest bits.
+    """
+    moves = np.asarray(moves, dtype=np.uint8)
+    padded = np.zeros(-(-len(moves) // 4) * 4, dtype=np.uint8)
+    padded[:len(moves)] = moves
+    padded = padded.reshape(-1, 4)
+    return (padded[:, 0] | padded[:, 1] << 2 | padded[:, 2] << 4 | padded[:, 3] << 6).tobytes()
+
+
+def unpack_moves(packed, nr_moves):
+    """
+    :return: An uint8 array with the first nr_moves move codes in the packed bytes.
+    """
+    packed = np.frombuffer(packed, dtype=np.uint8)
+    return ((packed[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3).reshape(-1)[:nr_moves]
+
+
+def save_recording(recording, path):
+    grow = 2 if recording.grow is None else int(recording.grow)
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, recording.board_width, recording.board_height,
+                               recording.food_blocks_max, recording.wall_blocks_max, int(recording.test_config), grow,
+                               recording.starvation_tics, recording.seed, len(recording.moves),
+                               len(recording.scores)))
+        file.write(pack_moves(recording.moves))
+        file.write(np.asarray(recording.scores, dtype="<i8").tobytes())
+        file.write(np.asarray(recording.lengths, dtype="<i8").tobytes())
+
+
+def load_recording(path):
+    with open(path, "rb") as file:
+        data = file.read()
+    magic, version, width, height, food, walls, test_config, grow, starvation, seed, nr_moves, nr_episodes = \
+        HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("{} is not a recording of this version".format(path))
+    offset = HEADER.size
+    packed_size = -(-nr_moves // 4)
+    moves = unpack_moves(data[offset:offset + packed_size], nr_moves)
+    offset += packed_size
+    scores = np.frombuffer(data, dtype="<i8", count=nr_episodes, offset=offset).astype(np.int64)
+    lengths = np.frombuffer(data, dtype="<i8", count=nr_episodes, offset=offset + 8 * nr_episodes).astype(np.int64)
+    return Recording(width, height, food, walls, bool(test_config), starvation, seed, None if grow == 2 else bool(grow),
+                     moves, scores, lengths)
+
+
+def create_game(recording):
+    """
+    Creates the game of the recording as it was at the start.
+
+    :return: A tuple (snake, board).
+    """
+    rng = random.Random(recording.seed)
+    snake = Snake(recording.board_width, recording.board_height, recording.starvation_tics, rng)
+    board = Board(recording.board_width, recording.board_height, recording.board_width, recording.board_height, snake,
+                  recording.food_blocks_max, recording.wall_blocks_max, recording.test_config, rng)
+    return snake, board
+
+
+class ReplayAgent:
+    """
+    Agent that makes the recorded moves.
+    """
+
+    def __init__(self, recording):
+        self.moves = recording.moves.tolist()
+        self.grow = bool(recording.grow)
+        self.position = 0
+
+    def get_move(self, board, score, turns_alive, turns_to_starve, direction, head_position, body_parts):
+        code = self.moves[self.position]
+        self.position += 1
+        return Move(code - 1) if code != DIED else None
+
+    def should_redraw_board(self):
+        return False
+
+    def get_view_radius(self):
+        # the agent does not look at the board, a small view is the cheapest thing to hand it
+        return 0
+
+    def should_grow_on_food_collision(self):
+        return self.grow
+
+    def on_die(self, head_position, board, score, body_parts):
+        pass
+
+
+def replay_with_engine(recording):
+    """
+    Replays the recording with the normal Snake and Board.
+
+    :return: A tuple (scores, lengths) of arrays with the score and the number of turns of every finished episode.
+    """
+    snake, board = create_game(recording)
+    agent = snake.agent = ReplayAgent(recording)
+    scores, lengths = [], []
+    while agent.position < len(agent.moves):
+        if snake.tics_to_starve == 0:
+            # the snake starves without asking the agent, but the turn was recorded
+            agent.position += 1
+        died, _ = snake.update(board)
+        if died:
+            scores.append(snake.score)
+            lengths.append(snake.tics_alive)
+            snake.reset(board, False, True)
+    return np.array(scores, dtype=np.int64), np.array(lengths, dtype=np.int64)
+
+
+def simulate(recording):
+    """
+    Replays the recording much faster than the normal engine can: it follows the rules of Snake.update and
+    Snake.reset and draws the same random numbers in the same order as Board, but keeps only what the rules need in
+    plain lists.
+
+    :return: A tuple (scores, lengths) of arrays with the score and the number of turns of every finished episode.
+    """
+    width, height = recording.board_width, recording.board_height
+    rng = random.Random(recording.seed)
+    randint = rng.randint
+    next_cell = get_next_cell_table(width, height).reshape(-1).tolist()
+    new_direction = NEW_DIRECTION_TABLE.reshape(-1).tolist()
+    empty, wall, food = GameObject.EMPTY, GameObject.WALL, GameObject.FOOD
+    grow = bool(recording.grow)
+    max_tics_to_starve = recording.starvation_tics
+
+    # the snake is placed first, see Snake.__init__
+    head = randint(0, width - 1) * height + randint(0, height - 1)
+    body = deque()
+    body_cells = set()
+    objects = [empty] * (width * height)
+
+    # the free cells in the same order as Board.free_cells, so the same free cell is picked for the same number
+    free_cells = []
+    free_cell_indices = {}
+
+    def update_free_cell(cell):
+        is_free = cell != head and objects[cell] is empty and cell not in body_cells
+        if is_free and cell not in free_cell_indices:
+            free_cell_indices[cell] = len(free_cells)
+            free_cells.append(cell)
+        elif not is_free and cell in free_cell_indices:
+            index = free_cell_indices.pop(cell)
+            last = free_cells.pop()
+            if last != cell:
+                free_cells[index] = last
+                free_cell_indices[last] = index
+
+    def get_free_cell():
+        if len(free_cells) == 0:
+            raise RuntimeError("Congratulations, you broke the game by filling each cell of the board!")
+        return free_cells[randint(0, len(free_cells) - 1)]
+
+    def place(cell, game_object):
+        objects[cell] = game_object
+        update_free_cell(cell)
+
+    # the board, see Board.__init__
+    for cell in range(width * height):
+        update_free_cell(cell)
+    if not recording.test_config:
+        w, h = width, height
+        not_allowed = {x * height + y for x, y in [(0, 1), (1, 0), (w - 2, 0), (w - 1, 1), (w - 1, h - 2),
+                                                   (w - 2, h - 1), (0, h - 2), (1, h - 1)]
+                       if 0 <= x < width and 0 <= y < height}
+        for i in range(recording.wall_blocks_max):
+            cell = get_free_cell()
+            while cell in not_allowed:
+                cell = get_free_cell()
+            place(cell, wall)
+    else:
+        place(7 * height + 5, wall)
+        place(15 * height + 8, wall)
+    for i in range(recording.food_blocks_max):
+        place(get_free_cell(), food)
+
+    scores, lengths = [], []
+    direction, size, score, tics_alive, tics_to_starve = 0, 0, 0, 0, max_tics_to_starve
+    for code in recording.moves.tolist():
+        died = code == DIED
+        if not died:
+            # see Snake.update. The body grows by at most one part per turn, so at most one tail is cut off. The
+            # board marks the old head, the tail and the new head in that order: the old head stays taken (unless it
+            # is the tail), the tail becomes free unless the new head moved into it and the new head is taken.
+            old_head = head
+            body.appendleft(old_head)
+            body_cells.add(old_head)
+            head = next_cell[head * 12 + direction * 3 + code]
+            direction = new_direction[direction * 3 + code]
+            if len(body) > size:
+                tail = body.pop()
+                body_cells.discard(tail)
+                if tail != head:
+                    free_cell_indices[tail] = len(free_cells)
+                    free_cells.append(tail)
+            if head == OFF_BOARD:
+                died = True
+            else:
+                index = free_cell_indices.pop(head, None)
+                if index is not None:
+                    last = free_cells.pop()
+                    if last != head:
+                        free_cells[index] = last
+                        free_cell_indices[last] = index
+                target = objects[head]
+                if target is wall or head in body_cells:
+                    died = True
+                else:
+                    if target is food:
+                        if grow:
+                            size += 1
+                        score += 1
+                        objects[head] = empty
+                        place(get_free_cell(), food)
+                        if max_tics_to_starve != -1:
+                            tics_to_starve = max_tics_to_starve + 1
+                    tics_alive += 1
+                    if max_tics_to_starve != -1:
+                        tics_to_starve -= 1
+
+        if died:
+            # see Snake.reset
+            scores.append(score)
+            lengths.append(tics_alive)
+            old_head, old_body = head, body
+            head = get_free_cell()
+            body = deque()
+            body_cells = set()
+            direction, size, score, tics_alive, tics_to_starve = 0, 0, 0, 0, max_tics_to_starve
+            if old_head != OFF_BOARD:
+                update_free_cell(old_head)
+            for cell in old_body:
+                update_free_cell(cell)
+            update_free_cell(head)
+    return np.array(scores, dtype=np.int64), np.array(lengths, dtype=np.int64)
+
+
+def check(recording, scores, lengths):
+    """
+    :return: None when the replayed episodes are the recorded ones, otherwise a description of the first difference.
+    """
+    for episode, (score, length, recorded_score, recorded_length) in enumerate(
+            zip(scores, lengths, recording.scores, recording.lengths)):
+        if score != recorded_score or length != recorded_length:
+            return "episode {}: score {} in {} turns, recorded score {} in {} turns".format(
+                episode, score, length, recorded_score, recorded_length)
+    if len(scores) != len(recording.scores):
+        return "{} episodes, recorded {}".format(len(scores), len(recording.scores))
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded game and check its outcome.")
+    parser.add_argument("recording", help="file written by headless.py --record")
+    parser.add_argument("--engine", action="store_true", help="also replay with the normal Snake and Board")
+    args = parser.parse_args(argv)
+
+    recording = load_recording(args.recording)
+    replays = [("fast replay", simulate)]
+    if args.engine:
+        replays.append(("engine replay", replay_with_engine))
+    failed = False
+    for name, replay in replays:
+        start = time.perf_counter()
+        scores, lengths = replay(recording)
+        seconds = time.perf_counter() - start
+        difference = check(recording, scores, lengths)
+        print("{}: {} turns, {} episodes in {:.2f}s ({:.0f} turns/s): {}".format(
+            name, len(recording.moves), len(scores), seconds, len(recording.moves) / seconds if seconds > 0 else 0,
+            "same as recorded" if difference is None else "DIFFERENT, " + difference))
+        failed = failed or difference is not None
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Experience replay for the tabular agent. Instead of learning from every move once, right after it is made, the agent
+stores its moves in a ReplayBuffer and learns from random minibatches of earlier moves:
+
+    agent = Agent(replay=ReplayBuffer(100000))
+
+The buffer is a ring of preallocated NumPy arrays, so it takes the same amount of memory from the start to the end of
+training, and a minibatch is applied to the Q-table with a few array operations (see batch_update) instead of one
+Python update per move.
+"""
+import numpy as np
+
+
+class ReplayBuffer:
+
+    def __init__(self, capacity, batch_size=32, learn_every=1, seed=None):
+        """
+        :param capacity: The maximum number of moves that are kept, the oldest move is overwritten first.
+
+        :param batch_size: The number of moves in a minibatch.
+
+        :param learn_every: The number of stored moves between two minibatches. With 4 and a batch size of 32, every
+        stored move is learned from 8 times on average.
+
+        :param seed: Seed of the random number generator that picks the minibatches, None for a random seed.
+        """
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.learn_every = learn_every
+        self.rng = np.random.default_rng(seed)
+        self.states = np.zeros(capacity, dtype=np.int64)
+        self.actions = np.zeros(capacity, dtype=np.int8)
+        self.rewards = np.zeros(capacity, dtype=np.float32)
+        self.next_states = np.zeros(capacity, dtype=np.int64)
+        self.dones = np.zeros(capacity, dtype=bool)
+        # index the next move is written to and the number of moves stored so far
+        self.position = 0
+        self.count = 0
+        self.added = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, state, action, reward, next_state):
+        """
+        Stores a move. next_state is None when the snake died.
+
+        :return: True when it is time to learn from a minibatch (see learn_every).
+        """
+        i = self.position
+        self.states[i] = state
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.dones[i] = next_state is None
+        self.next_states[i] = next_state if next_state is not None else 0
+        self.position = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.added += 1
+        return self.added % self.learn_every == 0
+
+    def sample(self, batch_size=None):
+        """
+        :return: A tuple (states, actions, rewards, next_states, dones) of arrays with a minibatch of random moves
+        (with replacement), or None when the buffer is still empty.
+        """
+        if self.count == 0:
+            return None
+        indices = self.rng.integers(0, self.count, size=batch_size or self.batch_size)
+        return (self.states[indices], self.actions[indices], self.rewards[indices], self.next_states[indices],
+                self.dones[indices])
+
+
+def batch_update(q_table, states, actions, rewards, next_states, dones, alpha, gamma):
+    """
+    Applies the Q-learning update of Agent.learn to a whole minibatch at once. All targets are computed from the table
+    as it was before the batch. When the same state and action occur more than once in the batch their updates are
+    averaged, so a popular move is not pushed further than alpha allows.
+
+    :return: The sum of the absolute changes of the table.
+    """
+    if not isinstance(q_table, np.ndarray):
+        # a SparseQTable is a dictionary, which can not be indexed with arrays
+        total = 0.0
+        for state, action, reward, next_state, done in zip(states, actions, rewards, next_states, dones):
+            next_max = 0 if done else np.max(q_table[next_state])
+            old_value = q_table[state][action]
+            q_table[state][action] = (1 - alpha) * old_value + alpha * (reward + gamma * next_max)
+            total += abs(q_table[state][action] - old_value)
+        return total
+
+    actions = actions.astype(np.int64)
+    next_max = np.where(dones, 0, q_table[next_states].max(axis=1))
+    deltas = alpha * (rewards + gamma * next_max - q_table[states, actions])
+    pairs, inverse, counts = np.unique(states * q_table.shape[1] + actions, return_inverse=True, return_counts=True)
+    deltas = (deltas / counts[inverse]).astype(q_table.dtype)
+    np.add.at(q_table, (states, actions), deltas)
+    return float(np.abs(np.bincount(inverse, weights=deltas)).sum())
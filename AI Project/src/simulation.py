@@ -0,0 +1,136 @@
+"""
+Runs the game on its own thread, independent of the window. The simulation thread plays turns at a fixed rate (or as
+fast as it can) while the window only looks at the board a limited number of times per second to draw it, so a slow
+agent no longer freezes the window and drawing no longer slows the game down.
+
+Everything that reads the game from another thread (i.e. drawing the board) must hold simulation.lock:
+
+    with simulation.lock:
+        board.draw(canvas)
+"""
+import threading
+import time
+from collections import deque
+
+
+class Simulation:
+
+    def __init__(self, snake, board, tics_per_second=10, unlimited=False, print_score_not_on_non_redraw=True,
+                 checkpointer=None, profile_every_tics=1000):
+        """
+        :param tics_per_second: The number of turns per second, 0 to pause.
+
+        :param unlimited: Whether to play as fast as possible, ignoring tics_per_second.
+
+        :param print_score_not_on_non_redraw: See main.py.
+
+        :param checkpointer: A checkpoint.Checkpointer that is told about every turn, None to not save checkpoints.
+
+        :param profile_every_tics: The number of turns between two reports of the profiler of the snake (if any).
+        """
+        self.snake = snake
+        self.board = board
+        self.tics_per_second = tics_per_second
+        self.unlimited = unlimited
+        self.print_score_not_on_non_redraw = print_score_not_on_non_redraw
+        self.checkpointer = checkpointer
+        self.profile_every_tics = profile_every_tics
+        self.lock = threading.Lock()
+        # set to wake up the simulation thread when the speed changed, a step was requested or it has to stop
+        self.wake_up = threading.Event()
+        # one entry per requested step, a deque because the window thread adds to it while this thread takes
+        self.requested_steps = deque()
+        self.running = False
+        self.thread = None
+        # whether the agent wanted the board to be drawn in the last turn
+        self.redraw_board = True
+        self.tics = 0
+        self.measured_tics = 0
+        self.measured_time = time.perf_counter()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake_up.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def set_speed(self, tics_per_second, unlimited=False):
+        self.tics_per_second = tics_per_second
+        self.unlimited = unlimited
+        self.wake_up.set()
+
+    def step(self):
+        """
+        Plays one turn on the simulation thread, i.e. when paused.
+        """
+        self.requested_steps.append(None)
+        self.wake_up.set()
+
+    def run(self):
+        """
+        The simulation thread. Turns are planned at fixed times, 1 / tics_per_second apart, so the time a turn takes
+        does not lower the rate. When the game falls too far behind (the agent is slower than the rate), it gives up
+        on catching up instead of playing a burst of turns.
+        """
+        next_tic = time.perf_counter()
+        while self.running:
+            if self.requested_steps:
+                self.requested_steps.popleft()
+                self.tick()
+                continue
+            # read once, the window thread may change it at any time
+            tics_per_second = self.tics_per_second
+            if self.unlimited:
+                self.tick()
+                continue
+            if tics_per_second <= 0:
+                self.wake_up.wait()
+                self.wake_up.clear()
+                next_tic = time.perf_counter()
+                continue
+
+            now = time.perf_counter()
+            if now < next_tic:
+                # sleep until the next turn, unless the speed changes or a step is requested before that
+                if self.wake_up.wait(next_tic - now):
+                    self.wake_up.clear()
+                    next_tic = min(next_tic, time.perf_counter() + 1 / tics_per_second)
+                continue
+            self.tick()
+            next_tic += 1 / tics_per_second
+            if next_tic < now - 0.25:
+                next_tic = now
+
+    def tick(self):
+        """
+        Plays one turn.
+        """
+        snake = self.snake
+        with self.lock:
+            died, redraw_board = snake.update(self.board)
+            if died:
+                snake.reset(self.board, redraw_board, self.print_score_not_on_non_redraw)
+            if self.checkpointer is not None:
+                self.checkpointer.tick()
+                if snake.profiler is not None:
+                    snake.profiler.lap("checkpoint")
+            self.redraw_board = redraw_board
+            self.tics += 1
+        if snake.profiler is not None and snake.profiler.tics % self.profile_every_tics == 0:
+            print(snake.profiler.report())
+
+    def measure(self):
+        """
+        :return: The number of turns per second played since the previous call.
+        """
+        now = time.perf_counter()
+        tics = self.tics
+        rate = (tics - self.measured_tics) / (now - self.measured_time) if now > self.measured_time else 0
+        self.measured_tics, self.measured_time = tics, now
+        return rate
@@ -1,89 +1,248 @@
-from random import randint
+import random
+from collections import deque
+from collections.abc import Sequence
 
 from agent import Agent
 from gameobjects import GameObject
 from move import Direction, Move
 
 
+class BodyParts(Sequence):
+    """
+    Read-only list-like view of the body of a snake. The first element is the body part directly following the head,
+    the last element is the tail. Checking whether a position is part of the body takes constant time.
+    """
+
+    def __init__(self, body, body_cells):
+        self.body = body
+        self.body_cells = body_cells
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        return self.body[index]
+
+    def __len__(self):
+        return len(self.body)
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def __contains__(self, position):
+        return position in self.body_cells
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+
 class Snake:
-    def __init__(self, board_width, board_height, max_tics_to_starve):
+    def __init__(self, board_width, board_height, max_tics_to_starve, rng=None):
+        """
+        :param rng: The random.Random that places the first snake, by default the random module itself. Later snakes
+        are placed by the board.
+        """
         self.board_width = board_width
         self.board_height = board_height
-        self.x = randint(0, board_width - 1)
-        self.y = randint(0, board_height - 1)
+        self.rng = rng if rng is not None else random
+        self.x = self.rng.randint(0, board_width - 1)
+        self.y = self.rng.randint(0, board_height - 1)
         self.direction = Direction.NORTH
-        self.body_parts = []
+        # the body, from the part directly following the head to the tail, and the set of cells it occupies
+        self.body = deque()
+        self.body_cells = set()
         self.score = 0
         self.tics_alive = 0
         self.tics_to_starve = max_tics_to_starve
         self.max_tics_to_starve = max_tics_to_starve
         self.agent = Agent()
         self.size = 0
+        # profiling.Profiler that measures the phases of every turn, None to not measure anything
+        self.profiler = None
+        # metrics.Metrics the episodes are reported to, None to not report
+        self.metrics = None
+        # recording.Recorder the moves are recorded by, None to not record
+        self.recorder = None
+        # the index of the snake in the snakes of its board, see Board.add_snake
+        self.number = 0
 
     def update(self, board):
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.start_tick()
+
         redraw_board = self.agent.should_redraw_board()
         # check input
         if not isinstance(redraw_board, bool):
             raise RuntimeError("redraw_board() must return a boolean value")
 
+        move = self.decide(board)
+        if move is None:
+            return True, redraw_board
+        self.advance(board, move)
+
+        # check if died
+        died = self.died(board)
+        if profiler is not None:
+            profiler.lap("collision")
+        if died:
+            return True, redraw_board
+
+        self.finish_turn(board)
+        return False, redraw_board
+
+    def decide(self, board, board_copy=None):
+        """
+        Asks the agent for its move. This is the first part of update, which is split up so an arena (see arena.py)
+        can let all snakes decide before any of them moves.
+
+        :param board_copy: A copy of the board to give to the agent when it wants to see the whole board, None to make
+        one.
+
+        :return: The Move, or None when the snake starved or the agent returned something that is not a move (the
+        snake then dies).
+        """
+        profiler = self.profiler
         # check starvation (if enabled)
         if self.tics_to_starve != -1 and self.tics_to_starve == 0:
-            return True, redraw_board
+            if self.recorder is not None:
+                self.recorder.record_move(None)
+            return None
 
-        # retrieve move from the agent
-        move = self.agent.get_move(board.get_copy(), self.score, self.tics_alive, self.tics_to_starve,
+        # retrieve move from the agent, showing it either the whole board or only the part around its head
+        view_radius = self.agent.get_view_radius()
+        if not isinstance(view_radius, int):
+            raise RuntimeError("get_view_radius() must return an integer value")
+        if view_radius == -1:
+            agent_board = board_copy if board_copy is not None else board.get_copy()
+        else:
+            agent_board = board.get_view(self.x, self.y, self.direction, view_radius)
+        if profiler is not None:
+            profiler.lap("board copy")
+        move = self.agent.get_move(agent_board, self.score, self.tics_alive, self.tics_to_starve,
                                    self.direction, (self.x, self.y), self.body_parts)
+        if profiler is not None:
+            profiler.lap("agent")
+        if self.recorder is not None:
+            self.recorder.record_move(move)
 
         # check return value of get_move
         if not (move == Move.RIGHT or move == Move.LEFT or move == Move.STRAIGHT):
-            return True, redraw_board
+            return None
+        return move
+
+    def get_next_position(self, move):
+        """
+        :return: The (x, y) position of the head after the given move.
+        """
+        dx, dy = self.direction.get_new_direction(move).get_xy_manipulation()
+        return self.x + dx, self.y + dy
 
+    def get_freed_cells(self):
+        """
+        :return: The cells the snake leaves with its next move: the tail, or the head when the snake has no body.
+        """
+        nr_freed = len(self.body) + 1 - self.size
+        freed = [self.body[-i] for i in range(1, min(nr_freed, len(self.body)) + 1)]
+        if nr_freed > len(self.body):
+            freed.append((self.x, self.y))
+        return freed
+
+    def advance(self, board, move):
+        """
+        Makes the move: the head moves and the tail follows.
+        """
         # adjust body parts
-        self.body_parts = [(self.x, self.y)] + self.body_parts
-        while len(self.body_parts) > self.size:
-            del self.body_parts[-1]
+        old_head = (self.x, self.y)
+        self.body.appendleft(old_head)
+        self.body_cells.add(old_head)
+        tails = []
+        while len(self.body) > self.size:
+            tail = self.body.pop()
+            self.body_cells.discard(tail)
+            tails.append(tail)
 
         self.direction = self.direction.get_new_direction(move)
         manipulation = self.direction.get_xy_manipulation()
         self.x += manipulation[0]
         self.y += manipulation[1]
 
-        # check if died
-        if self.died(board):
-            return True, redraw_board
+        # tell the board which cells changed
+        board.mark_dirty(old_head[0], old_head[1], self)
+        for tail in tails:
+            board.mark_dirty(tail[0], tail[1], self)
+        board.mark_dirty(self.x, self.y, self)
+        if self.profiler is not None:
+            self.profiler.lap("move")
 
+    def finish_turn(self, board):
+        """
+        Ends a turn the snake survived: it eats the food it moved onto and gets one turn closer to starving.
+        """
         # check on collision with food
-        if board.board[self.x][self.y] == GameObject.FOOD:
+        if board.board.item(self.x, self.y) == GameObject.FOOD:
             should_grow = self.agent.should_grow_on_food_collision()
             if not isinstance(should_grow, bool):
                 raise RuntimeError("should_grow_on_food_collision() must return a boolean value")
+            if self.recorder is not None:
+                self.recorder.record_grow(should_grow)
             if should_grow:
                 self.size += 1
             self.score += 1
             board.eat_food(self.x, self.y)
             if self.max_tics_to_starve != -1:
                 self.tics_to_starve = self.max_tics_to_starve + 1
+            if self.profiler is not None:
+                self.profiler.lap("food")
 
         self.tics_alive += 1
         if self.max_tics_to_starve != -1:
             self.tics_to_starve -= 1
 
-        return False, redraw_board
-
     def reset(self, board, redraw_board, print_score_not_on_non_redraw):
         if redraw_board or (not redraw_board and not print_score_not_on_non_redraw):
             print("Score achieved: {}. Turns it took: {}".format(self.score, self.tics_alive))
+        if self.recorder is not None:
+            self.recorder.record_episode(self.score, self.tics_alive)
         self.agent.on_die((self.x, self.y), board.get_copy_without_snake(), self.score, self.body_parts)
+        # after on_die, so the last update of the agent counts for the episode that ends
+        if self.metrics is not None:
+            self.metrics.record_episode(self.score, self.tics_alive)
         self.tics_alive = 0
         self.score = 0
         self.direction = Direction.NORTH
         self.tics_to_starve = self.max_tics_to_starve
+        old_head, old_body = (self.x, self.y), self.body
         self.x, self.y = board.get_free_xy()
-        self.body_parts = []
+        # new containers instead of clearing, so a view handed to the agent keeps showing the body at death
+        self.body = deque()
+        self.body_cells = set()
         self.size = 0
+        board.mark_dirty(old_head[0], old_head[1], self)
+        for x, y in old_body:
+            board.mark_dirty(x, y, self)
+        board.mark_dirty(self.x, self.y, self)
+        if self.profiler is not None:
+            self.profiler.lap("reset")
+
+    @property
+    def body_parts(self):
+        """
+        :return: A read-only list-like view of the body, see BodyParts.
+        """
+        return BodyParts(self.body, self.body_cells)
+
+    @body_parts.setter
+    def body_parts(self, body_parts):
+        self.body = deque(body_parts)
+        self.body_cells = set(self.body)
 
     def contains_body(self, x, y):
-        return (x, y) in self.body_parts
+        return (x, y) in self.body_cells
 
     def contains_head(self, x, y):
         return self.x == x and self.y == y
@@ -95,6 +254,6 @@ class Snake:
             return True
         if board.is_wall_at(self.x, self.y):
             return True
-        if (self.x, self.y) in self.body_parts:
+        if (self.x, self.y) in self.body_cells:
             return True
         return False
@@ -0,0 +1,298 @@
+"""
+Hyperparameter sweep of the agent. Every configuration (a value for some of alpha, gamma, epsilon, epsilon_decay and
+min_epsilon of Agent) is trained headless in a pool of worker processes, all on games with the same seed, and compared
+by the food eaten per penalty.
+
+Configurations that are clearly worse are stopped early with asynchronous successive halving: every configuration
+first plays min_tics turns (rung 0). A configuration that is among the best 1 / eta of the configurations that finished
+a rung continues for eta times as many turns on the next rung, up to max_rung. A worker that is free promotes such a
+configuration or starts a new one, so no worker waits for a rung to be complete.
+
+From Python:
+
+    from sweep import grid, sweep
+    trials = sweep(grid({"alpha": [0.2, 0.6], "gamma": [0.2, 0.8]}), min_tics=2000)
+
+or from the command line, for a grid:
+
+    python sweep.py --alpha 0.2 0.4 0.6 --gamma 0.2 0.5 0.8 --output curves.csv
+
+or for 200 random configurations between the given bounds:
+
+    python sweep.py --random 200 --alpha 0.05 0.9 --gamma 0.1 0.9 --epsilon-decay 1e-10 1e-6 --log-scale epsilon_decay
+"""
+import argparse
+import csv
+import itertools
+import math
+import os
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from headless import add_game_arguments, create_game, run
+
+HYPERPARAMETERS = ('alpha', 'gamma', 'epsilon', 'epsilon_decay', 'min_epsilon')
+
+# the food eaten and the penalties received after the given number of turns of a trial
+CurvePoint = namedtuple('CurvePoint', ['tics', 'food', 'penalties'])
+
+
+class Trial:
+    """
+    One configuration of the sweep, with its learning curve and the game it is trained in (between rungs).
+    """
+
+    def __init__(self, number, config):
+        self.number = number
+        self.config = config
+        # the highest rung finished, -1 before the first one
+        self.rung = -1
+        # the score of every finished rung, see get_score
+        self.scores = []
+        self.curve = []
+        self.game = None
+
+    @property
+    def tics(self):
+        return self.curve[-1].tics if self.curve else 0
+
+    @property
+    def score(self):
+        """
+        The score of the highest rung finished, None before the first one.
+        """
+        return self.scores[-1] if self.scores else None
+
+
+def grid(space):
+    """
+    :param space: A dictionary from hyperparameter name to the list of values to try.
+
+    :return: A list with a configuration (a dictionary from hyperparameter name to value) for every combination.
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def sample(space, nr_configs, rng=None, log_scale=()):
+    """
+    :param space: A dictionary from hyperparameter name to its (lowest, highest) value.
+
+    :param log_scale: The names of the hyperparameters that are drawn uniformly on a logarithmic scale, which suits
+    values that range over several orders of magnitude (like epsilon_decay).
+
+    :return: A list of nr_configs configurations with values drawn at random between the bounds.
+    """
+    rng = rng if rng is not None else random
+    configs = []
+    for i in range(nr_configs):
+        config = {}
+        for name, (low, high) in space.items():
+            if name in log_scale:
+                config[name] = math.exp(rng.uniform(math.log(low), math.log(high)))
+            else:
+                config[name] = rng.uniform(low, high)
+        configs.append(config)
+    return configs
+
+
+def get_score(start, end):
+    """
+    :return: The food eaten per penalty between two CurvePoints, the penalties are counted as at least one.
+    """
+    return (end.food - start.food) / max(end.penalties - start.penalties, 1)
+
+
+def run_trial(config, game, done_tics, tics, seed, game_settings, curve_every):
+    """
+    Body of a job of a worker process: plays the given number of turns with the configuration.
+
+    :param game: The (snake, board) to continue, None to start a new game with the seed.
+
+    :param done_tics: The number of turns already played in the game.
+
+    :return: A tuple (game, curve) with the game to continue on the next rung and a CurvePoint every curve_every
+    turns.
+    """
+    if game is None:
+        game = create_game(*game_settings, seed=seed)
+        for name, value in config.items():
+            setattr(game[0].agent, name, value)
+    snake, board = game
+    agent = snake.agent
+    curve = []
+    while tics > 0:
+        result = run(snake=snake, board=board, max_tics=min(curve_every, tics))
+        tics -= result.tics
+        done_tics += result.tics
+        curve.append(CurvePoint(done_tics, agent.food, agent.total_penalties))
+    return game, curve
+
+
+def get_next_job(trials, nr_started, eta, max_rung, promoted):
+    """
+    :return: A tuple (trial, rung) with the next trial to play and the rung to play, None when there is nothing left
+    to do (for now).
+    """
+    # promote from the highest rung first, so the best configurations finish early
+    for rung in range(max_rung - 1, -1, -1):
+        finished = sorted((trial for trial in trials if trial.rung >= rung), key=lambda trial: -trial.scores[rung])
+        for trial in finished[:len(finished) // eta]:
+            if trial.rung == rung and (trial.number, rung) not in promoted:
+                promoted.add((trial.number, rung))
+                return trial, rung + 1
+    if nr_started < len(trials):
+        return trials[nr_started], 0
+    return None
+
+
+def sweep(configs, min_tics=2000, eta=3, max_rung=3, nr_workers=None, seed=0, curve_every=None,
+          board_width=5, board_height=5, food_blocks_max=1, wall_blocks_max=1, test_config=False,
+          starvation_tics=-1, print_progress=False):
+    """
+    Trains every configuration with asynchronous successive halving, see the top of this file.
+
+    :param configs: The configurations, see grid and sample.
+
+    :param min_tics: The number of turns of rung 0, rung k plays min_tics * eta ** k turns.
+
+    :param eta: Only the best 1 / eta of the configurations of a rung continue on the next.
+
+    :param max_rung: The highest rung, 0 to train every configuration for min_tics turns only.
+
+    :param nr_workers: The number of worker processes, by default the number of cores.
+
+    :param seed: Seed of the games, every configuration plays the same games.
+
+    :param curve_every: The number of turns between two points of the learning curves, by default min_tics / 10.
+
+    :param board_width, board_height, food_blocks_max, wall_blocks_max, test_config, starvation_tics: The game
+    settings, these have the same meaning as the game settings in main.py.
+
+    :return: The list of Trials, with the best one (highest score on the highest rung) first.
+    """
+    for config in configs:
+        unknown = set(config) - set(HYPERPARAMETERS)
+        if unknown:
+            raise ValueError("unknown hyperparameters: {}".format(", ".join(sorted(unknown))))
+    nr_workers = nr_workers if nr_workers is not None else os.cpu_count()
+    curve_every = curve_every if curve_every is not None else max(min_tics // 10, 1)
+    game_settings = (board_width, board_height, food_blocks_max, wall_blocks_max, test_config, starvation_tics)
+    trials = [Trial(number, config) for number, config in enumerate(configs)]
+    nr_started = 0
+    promoted = set()
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(nr_workers) as pool:
+        running = {}
+
+        def submit():
+            nonlocal nr_started
+            job = get_next_job(trials, nr_started, eta, max_rung, promoted)
+            if job is None:
+                return False
+            trial, rung = job
+            if rung == 0:
+                nr_started += 1
+            tics = min_tics * eta ** rung - trial.tics
+            future = pool.submit(run_trial, trial.config, trial.game, trial.tics, tics, seed, game_settings,
+                                 curve_every)
+            # the game travels with the job, the trial does not need it while it is played
+            trial.game = None
+            running[future] = (trial, rung)
+            return True
+
+        while len(running) < nr_workers and submit():
+            pass
+        while running:
+            done, not_done = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                trial, rung = running.pop(future)
+                trial.game, curve = future.result()
+                rung_start = trial.curve[-1] if trial.curve else CurvePoint(0, 0, 0)
+                trial.curve.extend(curve)
+                trial.scores.append(get_score(rung_start, trial.curve[-1]))
+                trial.rung = rung
+                # only the games of trials that may be promoted are kept
+                if rung == max_rung:
+                    trial.game = None
+                if print_progress:
+                    print("{:.1f}s: trial {} finished rung {} with {:.3f} food per penalty".format(
+                        time.perf_counter() - start, trial.number, rung, trial.score))
+            while len(running) < nr_workers and submit():
+                pass
+
+    for trial in trials:
+        trial.game = None
+    return sorted(trials, key=lambda trial: (-trial.rung, -trial.score))
+
+
+def save_curves(trials, path):
+    """
+    Writes the learning curves of the trials to a CSV file, one row per curve point.
+    """
+    names = [name for name in HYPERPARAMETERS if any(name in trial.config for trial in trials)]
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["trial"] + names + ["tics", "food", "penalties", "food_per_penalty"])
+        for trial in sorted(trials, key=lambda trial: trial.number):
+            previous = CurvePoint(0, 0, 0)
+            for point in trial.curve:
+                writer.writerow([trial.number] + [trial.config.get(name, "") for name in names] +
+                                [point.tics, point.food, point.penalties, get_score(previous, point)])
+                previous = point
+
+
+def format_config(config):
+    return ", ".join("{}={:.4g}".format(name, value) for name, value in config.items())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search the best hyperparameters of the agent.")
+    add_game_arguments(parser)
+    for name in HYPERPARAMETERS:
+        parser.add_argument("--" + name.replace("_", "-"), type=float, nargs="+", default=None,
+                            help="values of {} to try (the lowest and highest value with --random)".format(name))
+    parser.add_argument("--random", type=int, default=None, metavar="N",
+                        help="try N random configurations instead of the grid of all given values")
+    parser.add_argument("--log-scale", nargs="+", default=(), choices=HYPERPARAMETERS,
+                        help="hyperparameters that --random draws on a logarithmic scale")
+    parser.add_argument("--min-tics", type=int, default=2000, help="turns of the first rung")
+    parser.add_argument("--eta", type=int, default=3, help="only the best 1 / eta of a rung continue")
+    parser.add_argument("--max-rung", type=int, default=3, help="highest rung")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the games")
+    parser.add_argument("--top", type=int, default=10, help="number of best configurations to print")
+    parser.add_argument("--output", default=None, help="CSV file to write the learning curves to")
+    parser.add_argument("--verbose", action="store_true", help="print every finished rung")
+    args = parser.parse_args(argv)
+
+    space = {name: getattr(args, name) for name in HYPERPARAMETERS if getattr(args, name) is not None}
+    if not space:
+        parser.error("give the values of at least one hyperparameter")
+    if args.random is not None:
+        if any(len(values) != 2 for values in space.values()):
+            parser.error("--random needs a lowest and highest value for every hyperparameter")
+        configs = sample(space, args.random, random.Random(args.seed), args.log_scale)
+    else:
+        configs = grid(space)
+
+    start = time.perf_counter()
+    trials = sweep(configs, args.min_tics, args.eta, args.max_rung, args.workers, args.seed, None, args.width,
+                   args.height, args.food, args.walls, args.test_config, args.starvation, args.verbose)
+    seconds = time.perf_counter() - start
+    if args.output is not None:
+        save_curves(trials, args.output)
+
+    total_tics = sum(trial.tics for trial in trials)
+    print("Configurations: {}. Turns: {}. Time: {:.2f}s ({:.0f} turns/s)".format(
+        len(trials), total_tics, seconds, total_tics / seconds if seconds > 0 else 0))
+    for trial in trials[:args.top]:
+        print("rung {}, {} turns, {:.3f} food per penalty: {}".format(trial.rung, trial.tics, trial.score,
+                                                                       format_config(trial.config)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Helpers shared by the tests: an agent that makes random moves, the game settings the engines are compared on and the
+comparison itself (see compare_with_snake_update).
+"""
+import random
+
+import numpy as np
+
+from gameobjects import GameObject
+from headless import create_game
+from move import Move
+
+# board width, board height, food, walls, starvation tics, whether the snake grows
+SETTINGS = [
+    (5, 5, 1, 1, -1, False),
+    (5, 5, 1, 1, -1, True),
+    (8, 6, 3, 4, 20, True),
+    (10, 10, 2, 10, -1, True),
+]
+
+# straight twice as often as a turn, so the snake lives long enough to grow
+MOVES = (Move.LEFT, Move.STRAIGHT, Move.STRAIGHT, Move.RIGHT)
+# mostly right turns, so the head often follows the tail around in a small circle
+CIRCLING_MOVES = (Move.RIGHT, Move.RIGHT, Move.RIGHT, Move.STRAIGHT)
+
+
+class RandomAgent:
+    """
+    Agent that makes random moves and remembers the last one in move (None when it was not asked, i.e. the snake
+    starved).
+    """
+
+    def __init__(self, seed, grow, moves=MOVES):
+        """
+        :param moves: The moves to choose from.
+        """
+        self.rng = random.Random(seed)
+        self.grow = grow
+        self.moves = moves
+        self.move = None
+
+    def get_move(self, board, score, turns_alive, turns_to_starve, direction, head_position, body_parts):
+        self.move = self.rng.choice(self.moves)
+        return self.move
+
+    def should_redraw_board(self):
+        return False
+
+    def get_view_radius(self):
+        return -1
+
+    def should_grow_on_food_collision(self):
+        return self.grow
+
+    def on_die(self, head_position, board, score, body_parts):
+        pass
+
+
+def play_turn(snake, board):
+    """
+    Plays one turn of the snake, which must have a RandomAgent. A snake that died is not reset.
+
+    :return: A tuple (move, died) with the move of the turn (Move.STRAIGHT when the snake starved) and whether the
+    snake died.
+    """
+    snake.agent.move = None
+    died, redraw_board = snake.update(board)
+    return snake.agent.move if snake.agent.move is not None else Move.STRAIGHT, died
+
+
+def describe_snake(snake):
+    """
+    :return: A tuple with everything the other engines must agree on with the snake, see compare_with_snake_update.
+    """
+    return (snake.x, snake.y, snake.direction.value, list(snake.body_parts), snake.size, snake.score,
+            snake.tics_alive, snake.tics_to_starve)
+
+
+def without_food(cells):
+    """
+    The other engines place new food with their own random numbers, so only the rest of the cells can be compared.
+
+    :return: The cells as a flat array, with empty cells where the food was.
+    """
+    cells = np.array(cells, dtype=np.uint8).ravel()
+    cells[cells == GameObject.FOOD] = GameObject.EMPTY
+    return cells
+
+
+def compare_with_snake_update(create_engine, width, height, food, walls, starvation, grow, moves, tics=3000):
+    """
+    Plays a seeded game with a RandomAgent and checks every turn that another engine follows Snake.update. Two copies
+    of the game in that engine are stepped with the moves of the snake: one loaded again every turn and one played on
+    from the start of every episode (with the food of the board, which it can not know).
+
+    :param create_engine: Function that takes the snake and the board and returns the game in the other engine, an
+    object with these methods: load(snake, board) loads the game of the snake, step(move) makes the move and returns
+    whether the snake died, check_died(snake) checks the result of an episode that just ended, describe() returns
+    the same tuple as describe_snake, get_cells() the cells of the game and set_food(food_positions) replaces the
+    food.
+    """
+    snake, board = create_game(width, height, food, walls, False, starvation, seed=1)
+    snake.agent = RandomAgent(1, grow, moves)
+    engine = create_engine(snake, board)
+    long_engine = create_engine(snake, board)
+    for tic in range(tics):
+        engine.load(snake, board)
+        move, died = play_turn(snake, board)
+
+        for stepped in (engine, long_engine):
+            assert stepped.step(move) == died
+            if died:
+                stepped.check_died(snake)
+            else:
+                assert stepped.describe() == describe_snake(snake)
+                assert (without_food(stepped.get_cells()) == without_food(board.get_cells())).all()
+        if died:
+            snake.reset(board, False, True)
+            long_engine.load(snake, board)
+        else:
+            long_engine.set_food(board.food_positions)
@@ -0,0 +1,42 @@
+import pytest
+
+from arena import Arena, create_arena
+from distance import DistanceField
+from headless import create_game
+from helpers import CIRCLING_MOVES, MOVES, SETTINGS, RandomAgent, play_turn
+
+
+def assert_repaired(board):
+    """
+    Checks the distances the board keeps up to date against a field computed from scratch.
+    """
+    field = board.get_distance_field()
+    field.update()
+    fresh = DistanceField(board)
+    assert field.free == fresh.free
+    assert field.food == fresh.food
+    assert field.distances == fresh.distances
+
+
+@pytest.mark.parametrize("moves", [MOVES, CIRCLING_MOVES])
+@pytest.mark.parametrize("width, height, food, walls, starvation, grow", SETTINGS)
+def test_repair_matches_rebuild(width, height, food, walls, starvation, grow, moves):
+    snake, board = create_game(width, height, food, walls, False, starvation, seed=1)
+    snake.agent = RandomAgent(1, grow, moves)
+    board.get_distance_field()
+    for tic in range(1000):
+        move, died = play_turn(snake, board)
+        if died:
+            snake.reset(board, False, True)
+        assert_repaired(board)
+
+
+def test_repair_matches_rebuild_in_arena():
+    board = create_arena(6, 12, 12, 4, 10, False, 30, seed=1)
+    for snake in board.snakes:
+        snake.agent = RandomAgent(snake.number, True)
+    arena = Arena(board)
+    board.get_distance_field()
+    for tic in range(500):
+        arena.reset(arena.update())
+        assert_repaired(board)
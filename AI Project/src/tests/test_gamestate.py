@@ -0,0 +1,61 @@
+import pytest
+
+from gameobjects import GameObject
+from gamestate import get_state
+from headless import create_game
+from helpers import CIRCLING_MOVES, MOVES, SETTINGS, compare_with_snake_update
+
+
+class StateEngine:
+    """
+    A GameState for compare_with_snake_update.
+    """
+
+    def __init__(self, snake, board):
+        self.load(snake, board)
+
+    def load(self, snake, board):
+        self.state = get_state(snake, board, seed=1)
+
+    def step(self, move):
+        clone = self.state.clone()
+        copy = self.state.get_copy()
+        before = copy.copy()
+        died = self.state.step(move)
+        # stepping the state changes neither its clone nor the copies of its cells
+        assert (clone.get_copy() == before).all()
+        assert (copy == before).all()
+        return died
+
+    def check_died(self, snake):
+        assert not self.state.alive
+
+    def describe(self):
+        state = self.state
+        return (state.x, state.y, state.direction.value, state.body_parts, state.size, state.score,
+                state.tics_alive, state.tics_to_starve)
+
+    def get_cells(self):
+        return self.state.get_copy()
+
+    def set_food(self, food_positions):
+        state = self.state
+        for cell in state.food:
+            state.cells[cell] = GameObject.EMPTY
+        state.food[:] = [x * state.height + y for x, y in food_positions]
+        for cell in state.food:
+            state.cells[cell] = GameObject.FOOD
+
+
+@pytest.mark.parametrize("moves", [MOVES, CIRCLING_MOVES])
+@pytest.mark.parametrize("width, height, food, walls, starvation, grow", SETTINGS)
+def test_step_follows_snake_update(width, height, food, walls, starvation, grow, moves):
+    compare_with_snake_update(StateEngine, width, height, food, walls, starvation, grow, moves)
+
+
+def test_changing_a_copy_keeps_the_state():
+    snake, board = create_game(5, 5, 1, 1, False, -1, seed=1)
+    state = get_state(snake, board, seed=1)
+    cells = bytes(state.cells)
+    state.get_copy()[:] = GameObject.WALL
+    assert bytes(state.cells) == cells
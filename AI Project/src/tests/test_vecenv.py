@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from gameobjects import GameObject
+from helpers import CIRCLING_MOVES, MOVES, SETTINGS, compare_with_snake_update
+from vecenv import VecSnakeEnv
+
+
+class EnvEngine:
+    """
+    The first game of a VecSnakeEnv with one game, for compare_with_snake_update.
+    """
+
+    def __init__(self, snake, board):
+        # the walls come with the cells of the game, see load
+        self.env = VecSnakeEnv(1, board.width, board.height, board.max_nr_food, 0, False, snake.max_tics_to_starve,
+                               snake.agent.should_grow_on_food_collision(), seed=1)
+        self.observation = None
+        self.load(snake, board)
+
+    def load(self, snake, board):
+        env = self.env
+        env.grid[0] = np.asarray(board.get_cells()).ravel()
+        env.x[0], env.y[0], env.direction[0] = snake.x, snake.y, snake.direction.value
+        body = [x * board.height + y for x, y in snake.body_parts]
+        env.body[0, :len(body)] = body
+        env.body_start[0], env.body_length[0] = 0, len(body)
+        env.size[0], env.score[0] = snake.size, snake.score
+        env.tics_alive[0], env.tics_to_starve[0] = snake.tics_alive, snake.tics_to_starve
+
+    def step(self, move):
+        observations, rewards, dones = self.env.step([move.value])
+        self.observation = observations[0]
+        return dones[0]
+
+    def check_died(self, snake):
+        assert self.env.final_score[0] == snake.score
+        assert self.env.final_tics_alive[0] == snake.tics_alive
+
+    def describe(self):
+        env = self.env
+        body = [divmod(int(env.body[0, (env.body_start[0] + i) % env.nr_cells]), env.height)
+                for i in range(env.body_length[0])]
+        return (env.x[0], env.y[0], env.direction[0], body, env.size[0], env.score[0], env.tics_alive[0],
+                env.tics_to_starve[0])
+
+    def get_cells(self):
+        return self.observation
+
+    def set_food(self, food_positions):
+        grid = self.env.grid[0]
+        grid[grid == GameObject.FOOD] = GameObject.EMPTY
+        for x, y in food_positions:
+            grid[x * self.env.height + y] = GameObject.FOOD
+
+
+@pytest.mark.parametrize("moves", [MOVES, CIRCLING_MOVES])
+@pytest.mark.parametrize("width, height, food, walls, starvation, grow", SETTINGS)
+def test_step_follows_snake_update(width, height, food, walls, starvation, grow, moves):
+    compare_with_snake_update(EnvEngine, width, height, food, walls, starvation, grow, moves)
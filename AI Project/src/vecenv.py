@@ -0,0 +1,235 @@
+"""
+Vectorized snake engine. It plays many games of snake at once, every game is kept in NumPy arrays and all games are
+advanced together with a single call to step(). The rules are the same as in snake.py and board.py:
+
+- every turn the old head becomes the first body part and the body is cut off to the size of the snake,
+- the snake dies when its new head is outside of the board, on a wall or on its own body,
+- eating food increases the score (and the size, if the snake should grow), after which a new food block spawns,
+- when starvation is enabled, the snake dies at the start of the turn in which it has zero turns left to starve.
+
+A game that ends is reset immediately: the walls and the food stay where they are and a new snake (of size zero,
+facing north) spawns at a random free cell, just like Snake.reset does.
+
+Every board is stored as a row of cell codes, which are the values of GameObject. Cell (x, y) is found at index
+x * board_height + y, so the observation returned by step() can be indexed as obs[env][x][y], just like the board
+handed to Agent.get_move.
+"""
+import numpy as np
+
+from gameobjects import GameObject
+from move import NEW_DIRECTION_TABLE, OFF_BOARD, get_next_cell_table
+
+WALL = GameObject.WALL.value
+FOOD = GameObject.FOOD.value
+EMPTY = GameObject.EMPTY.value
+SNAKE_HEAD = GameObject.SNAKE_HEAD.value
+SNAKE_BODY = GameObject.SNAKE_BODY.value
+
+NORTH = 0
+
+
+class VecSnakeEnv:
+    max_random_tries = 5
+
+    def __init__(self, num_envs, board_width, board_height, max_nr_food=1, nr_walls=1, test_config=False,
+                 max_tics_to_starve=-1, grow_on_food_collision=False, reward_food=1.0, reward_die=-1.0,
+                 reward_move=0.0, seed=None):
+        """
+        :param num_envs: The number of games played at once.
+
+        :param board_width, board_height, max_nr_food, nr_walls, test_config, max_tics_to_starve: The game
+        settings, these have the same meaning as the game settings in main.py.
+
+        :param grow_on_food_collision: Whether the snakes grow when eating, see Agent.should_grow_on_food_collision.
+
+        :param reward_food, reward_die, reward_move: The reward given for eating food, for dying and for any other
+        move.
+
+        :param seed: Seed of the random number generator, None for a random seed.
+        """
+        self.num_envs = num_envs
+        self.width = board_width
+        self.height = board_height
+        self.nr_cells = board_width * board_height
+        self.max_nr_food = max_nr_food
+        self.max_tics_to_starve = max_tics_to_starve
+        self.grow_on_food_collision = grow_on_food_collision
+        self.reward_food = reward_food
+        self.reward_die = reward_die
+        self.reward_move = reward_move
+        self.rng = np.random.default_rng(seed)
+        self.envs = np.arange(num_envs)
+        self.next_cell = get_next_cell_table(board_width, board_height)
+
+        self.grid = np.full((num_envs, self.nr_cells), EMPTY, dtype=np.uint8)
+        self.x = np.zeros(num_envs, dtype=np.int64)
+        self.y = np.zeros(num_envs, dtype=np.int64)
+        self.direction = np.full(num_envs, NORTH, dtype=np.int64)
+        # the body is a ring buffer of cell indices, body[body_start] is the body part directly following the head
+        self.body = np.zeros((num_envs, self.nr_cells), dtype=np.int64)
+        self.body_start = np.zeros(num_envs, dtype=np.int64)
+        self.body_length = np.zeros(num_envs, dtype=np.int64)
+        self.size = np.zeros(num_envs, dtype=np.int64)
+        self.score = np.zeros(num_envs, dtype=np.int64)
+        self.tics_alive = np.zeros(num_envs, dtype=np.int64)
+        self.tics_to_starve = np.full(num_envs, max_tics_to_starve, dtype=np.int64)
+        # score and number of turns of the games that ended during the last step
+        self.final_score = np.zeros(num_envs, dtype=np.int64)
+        self.final_tics_alive = np.zeros(num_envs, dtype=np.int64)
+
+        # the snake is placed first (anywhere), after which the walls and food are placed around it
+        self.x[:] = self.rng.integers(0, board_width, size=num_envs)
+        self.y[:] = self.rng.integers(0, board_height, size=num_envs)
+        heads = self.x * board_height + self.y
+        self.grid[self.envs, heads] = SNAKE_HEAD
+
+        w, h = board_width, board_height
+        wall_pos_not_allowed = {self.to_cell(x, y) for x, y in [(0, 1), (1, 0), (w - 2, 0), (w - 1, 1),
+                                                                (w - 1, h - 2), (w - 2, h - 1), (0, h - 2),
+                                                                (1, h - 1)]}
+        for env in range(num_envs):
+            if not test_config:
+                for i in range(nr_walls):
+                    cell = self._get_free_cell(env)
+                    while cell in wall_pos_not_allowed:
+                        cell = self._get_free_cell(env)
+                    self.grid[env, cell] = WALL
+            else:
+                self.grid[env, self.to_cell(7, 5)] = WALL
+                self.grid[env, self.to_cell(15, 8)] = WALL
+        for i in range(max_nr_food):
+            self._spawn_food(self.envs)
+
+    def to_cell(self, x, y):
+        return x * self.height + y
+
+    def get_observation(self):
+        """
+        :return: The boards of all games as an array of shape (num_envs, board_width, board_height) holding the
+        GameObject values. This is a view on the engine state, copy it when it has to survive the next step.
+        """
+        return self.grid.reshape(self.num_envs, self.width, self.height)
+
+    def step(self, actions):
+        """
+        Advances all games by one turn.
+
+        :param actions: An array with one move value (-1 for left, 0 for straight and 1 for right, see Move) per game.
+
+        :return: A tuple (observations, rewards, dones). The observations are the boards after the step (a finished
+        game has already been reset), the rewards are float32 values and dones indicates which games ended in this
+        step. The score and length of the finished games are kept in final_score and final_tics_alive.
+        """
+        actions = np.asarray(actions, dtype=np.int64)
+        rewards = np.full(self.num_envs, self.reward_move, dtype=np.float32)
+
+        # check starvation (if enabled)
+        if self.max_tics_to_starve != -1:
+            starved = self.tics_to_starve == 0
+        else:
+            starved = np.zeros(self.num_envs, dtype=bool)
+        alive = ~starved
+        envs = self.envs[alive]
+
+        # adjust body parts: the old head becomes the first body part, then the tail is cut off
+        old_heads = self.x[envs] * self.height + self.y[envs]
+        self.body_start[envs] = (self.body_start[envs] - 1) % self.nr_cells
+        self.body[envs, self.body_start[envs]] = old_heads
+        self.body_length[envs] += 1
+        self.grid[envs, old_heads] = SNAKE_BODY
+        too_long = envs[self.body_length[envs] > self.size[envs]]
+        tails = self.body[too_long, (self.body_start[too_long] + self.body_length[too_long] - 1) % self.nr_cells]
+        self.grid[too_long, tails] = EMPTY
+        self.body_length[too_long] -= 1
+
+        # move the head
+        moves = actions[envs] + 1
+        new_heads = self.next_cell[old_heads, self.direction[envs], moves]
+        self.direction[envs] = NEW_DIRECTION_TABLE[self.direction[envs], moves]
+        self.x[envs] = new_heads // self.height
+        self.y[envs] = new_heads % self.height
+
+        # check if died
+        inside = new_heads != OFF_BOARD
+        new_heads = np.where(inside, new_heads, 0)
+        target = self.grid[envs, new_heads]
+        crashed = ~inside | (target == WALL) | (target == SNAKE_BODY)
+        dones = starved.copy()
+        dones[envs[crashed]] = True
+
+        envs, new_heads, target = envs[~crashed], new_heads[~crashed], target[~crashed]
+        self.grid[envs, new_heads] = SNAKE_HEAD
+
+        # check on collision with food
+        ate = target == FOOD
+        eating = envs[ate]
+        if len(eating) > 0:
+            if self.grow_on_food_collision:
+                self.size[eating] += 1
+            self.score[eating] += 1
+            rewards[eating] = self.reward_food
+            self._spawn_food(eating)
+            if self.max_tics_to_starve != -1:
+                self.tics_to_starve[eating] = self.max_tics_to_starve + 1
+
+        self.tics_alive[envs] += 1
+        if self.max_tics_to_starve != -1:
+            self.tics_to_starve[envs] -= 1
+
+        finished = self.envs[dones]
+        if len(finished) > 0:
+            rewards[finished] = self.reward_die
+            self.final_score[finished] = self.score[finished]
+            self.final_tics_alive[finished] = self.tics_alive[finished]
+            self.reset(finished)
+
+        return self.get_observation(), rewards, dones
+
+    def reset(self, envs=None):
+        """
+        Removes the snakes of the given games and spawns new ones at a random free cell. Walls and food stay.
+
+        :param envs: Array with the indices of the games to reset, None for all games.
+        """
+        if envs is None:
+            envs = self.envs
+        grid = self.grid[envs]
+        grid[grid >= SNAKE_HEAD] = EMPTY
+        self.grid[envs] = grid
+        self.direction[envs] = NORTH
+        self.body_start[envs] = 0
+        self.body_length[envs] = 0
+        self.size[envs] = 0
+        self.score[envs] = 0
+        self.tics_alive[envs] = 0
+        self.tics_to_starve[envs] = self.max_tics_to_starve
+        heads = self._get_free_cells(envs)
+        self.x[envs] = heads // self.height
+        self.y[envs] = heads % self.height
+        self.grid[envs, heads] = SNAKE_HEAD
+
+    def _spawn_food(self, envs):
+        self.grid[envs, self._get_free_cells(envs)] = FOOD
+
+    def _get_free_cells(self, envs):
+        """
+        Vectorized version of Board.get_free_xy: a few random guesses per game, followed by picking uniformly from
+        all free cells for the games that were unlucky every time.
+        """
+        cells = self.rng.integers(0, self.nr_cells, size=len(envs))
+        taken = np.flatnonzero(self.grid[envs, cells] != EMPTY)
+        count = 0
+        while len(taken) > 0 and count < self.max_random_tries:
+            count += 1
+            cells[taken] = self.rng.integers(0, self.nr_cells, size=len(taken))
+            taken = taken[self.grid[envs[taken], cells[taken]] != EMPTY]
+
+        for i in taken:
+            cells[i] = self._get_free_cell(envs[i])
+        return cells
+
+    def _get_free_cell(self, env):
+        available = np.flatnonzero(self.grid[env] == EMPTY)
+        if len(available) == 0:
+            raise RuntimeError("Congratulations, you broke the game by filling each cell of the board!")
+        return available[self.rng.integers(0, len(available))]